@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'main.middleware.RoleBasedAccessMiddleware',
+    'main.middleware.PrimaryPinMiddleware',
 ]
 
 ROOT_URLCONF = 'jobportal.urls'
@@ -64,6 +66,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.identity',
             ],
         },
     },
@@ -75,13 +78,70 @@ WSGI_APPLICATION = 'jobportal.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# sqlite tuned for several workers: in WAL mode readers don't block on a
+# writer, a writer waits up to the timeout for the lock instead of failing
+# with "database is locked", and atomic blocks take the write lock up front
+# (BEGIN IMMEDIATE) so two transactions can't deadlock upgrading read locks
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # safe with WAL, fsync at checkpoints only
+    'busy_timeout': 20000,  # ms
+    'cache_size': -64000,  # KiB, per connection
+    'mmap_size': 268435456,  # bytes
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # keep connections (and their page cache) between requests
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # seconds
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+    }
+}
+
+# read replicas for the public job pages (home, job list, job details),
+# alias -> weight. a user who just wrote reads from the primary for
+# REPLICA_PIN_SECONDS. empty sends everything to default
+DATABASE_REPLICAS = {}
+REPLICA_PIN_SECONDS = 10
+DATABASE_ROUTERS = ['main.routers.ReplicaRouter']
+
+# a local replica, a second sqlite file refreshed with
+# `python manage.py sync_replicas --interval 5`
+USE_LOCAL_REPLICA = False
+if USE_LOCAL_REPLICA:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = {'replica': 1}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# local memory is per process, with several workers use a shared backend
+# (redis, memcached) so fragment invalidation and hit counters are shared
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# sessions are read from the cache and only hit the database on a miss,
+# 'django.contrib.sessions.backends.signed_cookies' needs no lookup at all
+# but logged in sessions can't be revoked server side
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -155,3 +215,48 @@ MESSAGE_TAGS = {
 # media
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# hash uploads as they stream in, resumes are stored by content
+FILE_UPLOAD_HANDLERS = [
+    'main.resumes.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# resume downloads, 'X-Accel-Redirect' (nginx) or 'X-Sendfile' (apache)
+# lets the front-end server send the file instead of a python worker.
+# with nginx, RESUME_SENDFILE_PREFIX is an internal location for MEDIA_ROOT
+RESUME_SENDFILE_HEADER = None
+RESUME_SENDFILE_PREFIX = '/protected/'
+
+# email, printed to the console until an smtp server is configured
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Campus Connect <no-reply@campusconnect.local>'
+
+# request profiling, see ProfilingMiddleware. share of requests timed in
+# detail with a Server-Timing header (0.01 is 1%), 0 to turn it off
+PROFILING_SAMPLE_RATE = 0
+# requests slower than this many ms are logged to main.profiling as one
+# json line each, None to turn it off
+PROFILING_SLOW_MS = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'main.profiling': {
+            'handlers': ['slow_requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Job, UserProfile, StudentProfile, EmployerProfile, Application, Saved
+from .models import Job, UserProfile, StudentProfile, EmployerProfile, Application, Saved, Task
+from .taskqueue import requeue
 
 
 @admin.register(UserProfile)
@@ -44,3 +45,16 @@ class SavedAdmin(admin.ModelAdmin):
     list_display = ('user', 'job', 'created_at')
     search_fields = ('user__username', 'job__title')
     list_filter = ('created_at',)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'created_at', 'finished_at')
+    search_fields = ('name', 'last_error')
+    list_filter = ('status', 'name')
+    actions = ['requeue_tasks']
+
+    @admin.action(description='Requeue selected dead tasks')
+    def requeue_tasks(self, request, queryset):
+        count = requeue(queryset)
+        self.message_user(request, f'{count} tasks requeued.')
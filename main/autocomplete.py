@@ -0,0 +1,263 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import groupby
+
+from django.db import connection
+
+from . import caching
+
+# prefixes up to this long match most of the index, their best phrases
+# are kept ready instead of ranked on every keystroke
+SHORT_PREFIX = 3
+TOP_K = 20  # phrases kept per short prefix, more than any lookup asks for
+REBUILD_INTERVAL = 30  # seconds before picking up changes made by other workers
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+class PrefixIndex:
+    """
+    sorted array of phrases, every word of a phrase is also a key so
+    "dev" finds "Software Developer", lookups use bisect
+    """
+
+    def __init__(self, texts=()):
+        self.counts = {}  # phrase -> [display text, number of active jobs]
+        for text in texts:
+            phrase = normalize(text)
+            if phrase in self.counts:
+                self.counts[phrase][1] += 1
+            elif phrase:
+                self.counts[phrase] = [text.strip(), 1]
+
+        # one sort for the whole build, not an insort per key
+        self.entries = sorted(  # (key, phrase)
+            (key, phrase) for phrase in self.counts for key in self.keys(phrase))
+
+        self.top = {}  # short prefix -> best TOP_K phrases, best first
+        for prefix, entries in groupby(self.entries, lambda entry: entry[0][:SHORT_PREFIX]):
+            self.top[prefix] = heapq.nsmallest(
+                TOP_K, {phrase for _, phrase in entries}, key=self.rank_key)
+        # the best of "sa" are among the best of "saa", "sab"... so shorter
+        # prefixes merge the lists below them instead of scanning again
+        for length in range(SHORT_PREFIX - 1, 0, -1):
+            merged = {}
+            for prefix, phrases in self.top.items():
+                if len(prefix) > length:
+                    merged.setdefault(prefix[:length], set()).update(phrases)
+            for prefix, phrases in merged.items():
+                phrases.update(self.top.get(prefix, ()))  # keys exactly this long
+                self.top[prefix] = heapq.nsmallest(TOP_K, phrases, key=self.rank_key)
+
+    def add(self, text):
+        phrase = normalize(text)
+        if not phrase:
+            return
+
+        if phrase in self.counts:
+            self.counts[phrase][1] += 1
+        else:
+            self.counts[phrase] = [text.strip(), 1]
+            for key in self.keys(phrase):
+                insort(self.entries, (key, phrase))
+        self.rerank(phrase, grew=True)
+
+    def remove(self, text):
+        phrase = normalize(text)
+        if phrase not in self.counts:
+            return
+
+        self.counts[phrase][1] -= 1
+        if self.counts[phrase][1] <= 0:
+            del self.counts[phrase]
+            for key in self.keys(phrase):
+                index = bisect_left(self.entries, (key, phrase))
+                if index < len(self.entries) and self.entries[index] == (key, phrase):
+                    del self.entries[index]
+        self.rerank(phrase, grew=False)
+
+    def rank_key(self, phrase):
+        return (-self.counts[phrase][1], phrase)
+
+    def rerank(self, phrase, grew):
+        """move a phrase whose count changed within the short prefix lists"""
+        prefixes = {key[:length] for key in self.keys(phrase)
+                    for length in range(1, SHORT_PREFIX + 1)}
+        for prefix in prefixes:
+            top = self.top.get(prefix)
+            if top is None:
+                if phrase in self.counts:
+                    self.top[prefix] = [phrase]
+                continue
+
+            if phrase in top:
+                top.remove(phrase)
+            elif not grew:
+                continue  # fell further behind the listed phrases
+            was_full = len(top) >= TOP_K - 1
+            if phrase in self.counts:
+                top.append(phrase)
+                top.sort(key=self.rank_key)
+            del top[TOP_K:]
+
+            # a phrase left out of a full list may rank above it now
+            if not grew and was_full and (not top or top[-1] == phrase
+                                          or phrase not in self.counts):
+                self.top[prefix] = self.rank(prefix, TOP_K)
+
+    def keys(self, phrase):
+        words = phrase.split(' ')
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def rank(self, prefix, limit):
+        """every phrase under prefix, ranked before cutting to limit"""
+        found = set()
+        index = bisect_left(self.entries, (prefix,))
+        while index < len(self.entries) and self.entries[index][0].startswith(prefix):
+            found.add(self.entries[index][1])
+            index += 1
+        return heapq.nsmallest(limit, found, key=self.rank_key)
+
+    def search(self, prefix, limit=8):
+        """phrases with a word starting with prefix, most jobs first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        if len(prefix) <= SHORT_PREFIX and limit <= TOP_K:
+            ranked = self.top.get(prefix, [])[:limit]
+        else:
+            ranked = self.rank(prefix, limit)
+
+        return [
+            (self.counts[phrase][0], self.counts[phrase][1])
+            for phrase in ranked
+        ]
+
+
+class JobSuggestions:
+    """prefix indexes over active job titles, company names and locations"""
+
+    FIELDS = ('title', 'company', 'location')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = False
+        self.rebuilding = False
+        self.reset()
+
+    def reset(self):
+        self.indexes = {field: PrefixIndex() for field in self.FIELDS}
+        self.jobs = {}  # job id -> (employer id, (title, company, location))
+        self.employers = {}  # employer user id -> job ids
+        self.version = None
+        self.built_at = 0
+
+    def build(self):
+        from .models import EmployerProfile, Job
+
+        # read the version first, a change made while reading is picked
+        # up by the next check instead of lost
+        version = caching.get_version('jobs')
+        companies = dict(EmployerProfile.objects.values_list(
+            'user_profile__user_id', 'company_name'))
+        jobs = {
+            job_id: (employer_id, (title, companies.get(employer_id, ''), location))
+            for job_id, employer_id, title, location in Job.objects.filter(
+                status='active').values_list('id', 'employer_id', 'title', 'location')
+            .iterator()
+        }
+        indexes = {
+            field: PrefixIndex(values[i] for _, values in jobs.values())
+            for i, field in enumerate(self.FIELDS)
+        }
+        employers = {}
+        for job_id, (employer_id, _) in jobs.items():
+            employers.setdefault(employer_id, set()).add(job_id)
+
+        with self.lock:
+            self.indexes, self.jobs, self.employers = indexes, jobs, employers
+            self.version = version
+            self.built = True
+            self.built_at = time.monotonic()
+
+    def rebuild_in_background(self):
+        try:
+            self.build()
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def ensure_fresh(self):
+        """
+        build on first use. when another worker changed jobs, rebuild in
+        a thread and keep answering from the current index meanwhile
+        """
+        if not self.built:
+            self.build()
+        elif time.monotonic() - self.built_at > REBUILD_INTERVAL:
+            self.built_at = time.monotonic()
+            if caching.get_version('jobs') != self.version and not self.rebuilding:
+                self.rebuilding = True
+                threading.Thread(target=self.rebuild_in_background, daemon=True).start()
+
+    def add_job(self, job_id, employer_id, title, company, location):
+        values = (title, company, location)
+        for field, value in zip(self.FIELDS, values):
+            self.indexes[field].add(value)
+        self.jobs[job_id] = (employer_id, values)
+        self.employers.setdefault(employer_id, set()).add(job_id)
+
+    def remove_job(self, job_id):
+        if job_id not in self.jobs:
+            return
+        employer_id, values = self.jobs.pop(job_id)
+        for field, value in zip(self.FIELDS, values):
+            self.indexes[field].remove(value)
+        self.employers.get(employer_id, set()).discard(job_id)
+
+    def update_job(self, job, company=None):
+        if not self.built:
+            return
+        if company is None:
+            from .search import get_company_name
+            company = get_company_name(job.employer_id)
+
+        with self.lock:
+            self.remove_job(job.id)
+            if job.status == 'active':
+                self.add_job(job.id, job.employer_id, job.title, company,
+                             job.location)
+
+    def delete_job(self, job_id):
+        if not self.built:
+            return
+        with self.lock:
+            self.remove_job(job_id)
+
+    def rename_company(self, employer_id, company):
+        if not self.built:
+            return
+        with self.lock:
+            for job_id in list(self.employers.get(employer_id, ())):
+                _, (title, _, location) = self.jobs[job_id]
+                self.remove_job(job_id)
+                self.add_job(job_id, employer_id, title, company, location)
+
+    def search(self, query, fields, limit=8):
+        self.ensure_fresh()
+        results = []
+        with self.lock:
+            for field in fields:
+                for text, count in self.indexes[field].search(query, limit):
+                    results.append({'text': text, 'type': field, 'count': count})
+
+        results.sort(key=lambda result: -result['count'])
+        return results[:limit]
+
+
+suggestions = JobSuggestions()
@@ -0,0 +1,64 @@
+import time
+
+from django.core.cache import cache
+
+
+def get_version(name):
+    """
+    version stamp for a group of cache entries, put it in the cache key
+    and bump it to drop every entry of the group at once
+    """
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so an evicted stamp never reuses old keys
+        version = time.time_ns()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    """returns the new stamp"""
+    key = f'version:{name}'
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_versions(names):
+    """version stamps for many groups in one cache round trip"""
+    keys = {f'version:{name}': name for name in names}
+    found = cache.get_many(keys)
+
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def expire_versions(names):
+    """a dropped stamp comes back as a new one, same as a bump"""
+    cache.delete_many([f'version:{name}' for name in names])
+
+
+def incr_counter(name, delta=1):
+    key = f'counter:{name}'
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # first hit, add so concurrent workers don't reset each other
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def get_counter(name):
+    return cache.get(f'counter:{name}', 0)
+
+
+def reset_counter(name):
+    cache.delete(f'counter:{name}')
@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .identity import get_identity
+
+
+def identity(request):
+    # lazy so pages that never show the navbar don't touch the session
+    return {'identity': SimpleLazyObject(lambda: get_identity(request))}
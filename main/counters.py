@@ -0,0 +1,71 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+STATUS_COUNTERS = {
+    'pending': 'pending_count',
+    'accepted': 'accepted_count',
+    'rejected': 'rejected_count',
+}
+
+
+def change(job_id, **deltas):
+    """move job counters in one UPDATE, never below zero"""
+    from .models import Job
+
+    updates = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items() if delta
+    }
+    if updates:
+        Job.objects.filter(id=job_id).update(**updates)
+
+
+def application_added(job_id, status, count=1):
+    change(job_id, application_count=count,
+           **{STATUS_COUNTERS[status]: count})
+
+
+def application_removed(job_id, status, count=1):
+    change(job_id, application_count=-count,
+           **{STATUS_COUNTERS[status]: -count})
+
+
+def status_changed(job_id, old_status, new_status, count=1):
+    if old_status == new_status:
+        return
+    change(job_id, **{
+        STATUS_COUNTERS[old_status]: -count,
+        STATUS_COUNTERS[new_status]: count,
+    })
+
+
+def counted(status=None):
+    from .models import Application
+
+    applications = Application.objects.filter(job=OuterRef('pk'))
+    if status:
+        applications = applications.filter(status=status)
+    return Coalesce(Subquery(
+        applications.values('job').annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def reconcile(jobs=None):
+    """
+    recount applications for jobs (all by default) and fix counters that
+    drifted, returns how many jobs were off
+    """
+    from .models import Job
+
+    if jobs is None:
+        jobs = Job.objects.all()
+
+    actual = {'application_count': counted()}
+    for status, field in STATUS_COUNTERS.items():
+        actual[field] = counted(status)
+
+    drifted = Q()
+    for field, value in actual.items():
+        drifted |= ~Q(**{field: value})
+
+    return jobs.filter(drifted).update(**actual)
@@ -0,0 +1,138 @@
+import hashlib
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import caching, search
+from .models import Job
+
+FACET_TIMEOUT = 300  # 5 minutes, date buckets move with the clock
+# largest monthly pay whose yearly amount fits the annual pay columns
+MAX_MONTHLY_PAY = (Decimal('999999999999.99') / 12).quantize(Decimal('0.01'))
+
+DATE_POSTED_CHOICES = [
+    ('today', 'Today'),
+    ('3days', 'Last 3 days'),
+    ('7days', 'Last 7 days'),
+    ('14days', 'Last 14 days'),
+    ('30days', 'Last 30 days'),
+]
+
+# facet name, job list filter it narrows, values to count
+FACETS = [
+    ('workplace', 'workplace_query',
+     [value for value, label in Job.WORKPLACE_CHOICES if value]),
+    ('work_type', 'work_type_query',
+     [value for value, label in Job.WORK_TYPE_CHOICES if value]),
+    ('pay_type', 'pay_type_query',
+     [value for value, label in Job.PAY_TYPE_CHOICES if value]),
+    ('date_posted', 'date_posted',
+     [value for value, label in DATE_POSTED_CHOICES]),
+]
+
+
+def date_posted_q(date_posted):
+    today = timezone.localdate()
+    if date_posted == 'today':
+        return Q(created_at__date=today)
+
+    days = {'3days': 3, '7days': 7, '14days': 14, '30days': 30}.get(date_posted)
+    if days:
+        # midnight in the site timezone, not a naive date
+        since = timezone.make_aware(
+            datetime.combine(today - timedelta(days=days), time.min))
+        return Q(created_at__gte=since)
+    return Q()
+
+
+def parse_pay(value):
+    """
+    monthly pay from the query string, capped so the yearly amount fits
+    the annual pay columns (max_digits=14, decimal_places=2)
+    """
+    try:
+        pay = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+    if not pay.is_finite() or pay < 0:
+        return None
+    return min(pay, MAX_MONTHLY_PAY).quantize(Decimal('0.01'))
+
+
+def pay_range_q(min_pay, max_pay):
+    """
+    jobs whose pay range overlaps the filter, the filter is per month and
+    is compared on the indexed yearly pay so every pay type matches
+    """
+    condition = Q()
+    low = parse_pay(min_pay)
+    high = parse_pay(max_pay)
+    if low is not None:
+        condition &= Q(annual_pay_max__gte=low * 12)
+    if high is not None:
+        condition &= Q(annual_pay_min__lte=high * 12)
+    return condition
+
+
+def facet_q(facet, value):
+    if not value:
+        return Q()
+    if facet == 'date_posted':
+        return date_posted_q(value)
+    return Q(**{facet: value})
+
+
+def normalize(filters):
+    """only the filters that change the counts, in a stable form"""
+    keys = ['search_query', 'location_query', 'min_pay_query', 'max_pay_query']
+    keys += [key for _, key, _ in FACETS]
+    return tuple(
+        (key, ' '.join(filters.get(key, '').lower().split())) for key in keys)
+
+
+def count_facets(filters):
+    """
+    count every facet value in one aggregate query, each facet ignores its
+    own filter so the other values of it still show how many jobs they have
+    """
+    jobs = Job.objects.filter(status='active')
+    if filters['search_query']:
+        jobs = search.filter_jobs(jobs, filters['search_query'])
+    if filters['location_query']:
+        jobs = jobs.filter(location__icontains=filters['location_query'])
+    jobs = jobs.filter(
+        pay_range_q(filters['min_pay_query'], filters['max_pay_query']))
+
+    selected = {facet: facet_q(facet, filters[key]) for facet, key, _ in FACETS}
+
+    aggregates = {}
+    for facet, key, values in FACETS:
+        others = Q()
+        for other, condition in selected.items():
+            if other != facet:
+                others &= condition
+
+        for value in values:
+            condition = others & facet_q(facet, value)
+            aggregates[f'{facet}__{value}'] = Count('id', filter=condition)
+
+    row = jobs.aggregate(**aggregates)
+    return {
+        facet: {value: row[f'{facet}__{value}'] for value in values}
+        for facet, key, values in FACETS
+    }
+
+
+def get_facet_counts(filters):
+    normalized = dict(normalize(filters))
+    digest = hashlib.md5(repr(sorted(normalized.items())).encode()).hexdigest()
+    key = f'facets:{caching.get_version("jobs")}:{digest}'
+
+    counts = cache.get(key)
+    if counts is None:
+        counts = count_facets(normalized)
+        cache.set(key, counts, FACET_TIMEOUT)
+    return counts
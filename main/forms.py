@@ -189,7 +189,7 @@ class JobForm(forms.ModelForm):
 
 class ApplicationForm(forms.ModelForm):
     resume = forms.FileField(
-        required=True,
+        required=False,
         validators=[FileExtensionValidator(
             allowed_extensions=['pdf', 'doc', 'docx'])],
         widget=forms.ClearableFileInput(
@@ -199,7 +199,26 @@ class ApplicationForm(forms.ModelForm):
             }
         )
     )
+    use_saved_resume = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Use the resume I applied with last time',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
     class Meta:
         model = Application
         fields = ['resume']
+
+    def __init__(self, *args, saved_resume=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # only offer the saved resume when there is one
+        if not saved_resume:
+            del self.fields['use_saved_resume']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # a new upload wins over the saved resume
+        if not cleaned_data.get('resume') and not cleaned_data.get('use_saved_resume'):
+            self.add_error('resume', 'This field is required.')
+        return cleaned_data
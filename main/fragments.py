@@ -0,0 +1,112 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import caching, routers
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24  # versioned keys never go stale, just expire
+
+# rendered pieces of a job, relative times like "2h ago" stay outside
+# so a cached fragment is never out of date
+FRAGMENTS = {
+    'card': 'main/job_card.html',
+    'panel': ('main/job_panel_header.html', 'main/job_panel_body.html'),
+}
+
+
+def job_version(job_id):
+    return f'job:{job_id}'
+
+
+def fragment_keys(kind, job_ids):
+    versions = caching.get_versions(job_version(job_id) for job_id in job_ids)
+    return {
+        job_id: f'fragment:{kind}:{job_id}:{versions[job_version(job_id)]}'
+        for job_id in job_ids
+    }
+
+
+def count(kind, hits, misses):
+    if hits:
+        caching.incr_counter(f'fragment:{kind}:hits', hits)
+    if misses:
+        caching.incr_counter(f'fragment:{kind}:misses', misses)
+
+
+def get_stats():
+    """hit/miss counters per fragment, shared by every worker of the cache"""
+    return {
+        kind: {
+            'hits': caching.get_counter(f'fragment:{kind}:hits'),
+            'misses': caching.get_counter(f'fragment:{kind}:misses'),
+        }
+        for kind in FRAGMENTS
+    }
+
+
+def reset_stats():
+    for kind in FRAGMENTS:
+        caching.reset_counter(f'fragment:{kind}:hits')
+        caching.reset_counter(f'fragment:{kind}:misses')
+
+
+def attach_cards(jobs):
+    """set job.card_html on every job, rendering only the cache misses"""
+    jobs = list(jobs)
+    if not jobs:
+        return
+
+    keys = fragment_keys('card', [job.id for job in jobs])
+    cached = cache.get_many(keys.values())
+
+    rendered = {}
+    for job in jobs:
+        key = keys[job.id]
+        if key in cached:
+            job.card_html = mark_safe(cached[key])
+        else:
+            job.card_html = render_to_string(FRAGMENTS['card'], {'job': job})
+            rendered[key] = job.card_html
+
+    if rendered:
+        cache.set_many(rendered, FRAGMENT_TIMEOUT)
+    count('card', len(jobs) - len(rendered), len(rendered))
+
+
+def get_panel(job_id, load_job):
+    """
+    panel pieces for a job, load_job is only called on a miss so a hit
+    doesn't touch the database
+    """
+    key = fragment_keys('panel', [job_id])[job_id]
+    panel = cache.get(key)
+    if panel is not None:
+        count('panel', 1, 0)
+        # some backends don't keep SafeString through serialization
+        return {**panel, 'header': mark_safe(panel['header']),
+                'body': mark_safe(panel['body'])}
+
+    job = load_job()
+    header, body = (render_to_string(name, {'job': job})
+                    for name in FRAGMENTS['panel'])
+    panel = {
+        'id': job.id,
+        'created_at': job.created_at,
+        'header': header,
+        'body': body,
+    }
+    cache.set(key, panel, FRAGMENT_TIMEOUT)
+    count('panel', 0, 1)
+    return panel
+
+
+def expire_jobs(job_ids):
+    """drop cached fragments now and again once the change is committed"""
+    names = [job_version(job_id) for job_id in job_ids]
+    if not names:
+        return
+    caching.expire_versions(names)
+    # a request that read the old row before commit may have cached it
+    transaction.on_commit(lambda: caching.expire_versions(names))
+    routers.after_replica_lag('main.caching.expire_versions', names)
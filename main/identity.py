@@ -0,0 +1,113 @@
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+
+from . import caching, thumbnails
+
+IDENTITY_KEY = '_identity'
+
+
+def version_name(profile_id):
+    return f'identity:{profile_id}'
+
+
+def user_version_name(user_id):
+    return f'identity:user:{user_id}'
+
+
+def version_names(user_id, profile_id):
+    names = [user_version_name(user_id)]
+    if profile_id is not None:
+        names.append(version_name(profile_id))
+    return names
+
+
+def build(user, profile):
+    """what the navbar and role checks need, small enough for the session"""
+    identity = {
+        'user_id': str(user.pk),
+        'username': user.username,
+        'profile_id': None,
+        'role': None,
+        'avatar': None,
+        # the session is only valid while this matches the password
+        'auth_hash': user.get_session_auth_hash(),
+    }
+    if profile is not None:
+        identity['profile_id'] = profile.id
+        identity['role'] = profile.role
+    identity['versions'] = caching.get_versions(
+        version_names(user.pk, identity['profile_id']))
+    if profile is None:
+        return identity
+
+    # only read the avatar when it was loaded with the profile, a profile
+    # created at register doesn't have one yet
+    related, field = {
+        'student': ('studentprofile', 'profile_img'),
+        'employer': ('employerprofile', 'logo'),
+    }[profile.role]
+    if profile._meta.get_field(related).is_cached(profile):
+        details = getattr(profile, related, None)
+        image = getattr(details, field, None)
+        if image:
+            identity['avatar'] = thumbnails.url(
+                image, 'avatar', getattr(details, f'{field}_thumbnailed'))
+
+    return identity
+
+
+def load_profile(user_id):
+    from .models import UserProfile
+
+    return UserProfile.objects.select_related(
+        'studentprofile', 'employerprofile'
+    ).filter(user_id=user_id).first()
+
+
+def remember(request, user, profile=None):
+    """store the identity in the session right after login or register"""
+    if profile is None:
+        profile = load_profile(user.pk)
+    request.session[IDENTITY_KEY] = build(user, profile)
+    return request.session[IDENTITY_KEY]
+
+
+def is_current(identity, session):
+    user_id = session.get(SESSION_KEY)
+    if identity is None or identity['user_id'] != str(user_id):
+        return False
+    # a hash rotated in this session, or a password changed elsewhere
+    # (which bumps the user's stamp), goes through the full session check
+    if identity.get('auth_hash') != session.get(HASH_SESSION_KEY):
+        return False
+    versions = caching.get_versions(version_names(user_id, identity['profile_id']))
+    return identity.get('versions') == versions
+
+
+def get_identity(request):
+    """
+    username, role and avatar of the logged in user, None when anonymous.
+    served from the session so pages that only show the navbar don't load
+    the user or profile, rebuilt when the profile changes
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+
+    identity = request.session.get(IDENTITY_KEY)
+    if is_current(identity, request.session):
+        return identity
+
+    # loading the user also checks the session is still valid
+    if not request.user.is_authenticated:
+        return None
+    return remember(request, request.user)
+
+
+def expire(profile_id):
+    """drop the identity of every session of a profile (role or avatar changed)"""
+    caching.bump_version(version_name(profile_id))
+
+
+def expire_user(user_id):
+    """drop the identity of every session of a user (password changed)"""
+    caching.bump_version(user_version_name(user_id))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Round
+
+from main.models import Job
+
+
+def annual_pay(field):
+    """sql expression converting a pay column to a yearly amount"""
+    output = DecimalField(max_digits=14, decimal_places=2)
+    whens = [
+        When(pay_type=pay_type, then=F(field) * Value(periods))
+        for pay_type, periods in Job.PAY_PERIODS_PER_YEAR.items()
+    ]
+    return Case(*whens, default=F(field) * Value(12), output_field=output)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the normalized annual and monthly pay of every job'
+
+    def handle(self, *args, **options):
+        # one UPDATE for the whole table, no rows are loaded into python
+        count = Job.objects.update(
+            annual_pay_min=Round(annual_pay('pay_min'), 2),
+            annual_pay_max=Round(annual_pay('pay_max'), 2),
+            monthly_pay_min=Round(annual_pay('pay_min') / Value(12), 2),
+            monthly_pay_max=Round(annual_pay('pay_max') / Value(12), 2),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Updated pay for {count} jobs.'))
@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# the job list read and the toggle_save write, on a scratch copy of the
+# tables so the benchmark never touches the real database
+SCHEMA = '''
+CREATE TABLE job (id INTEGER PRIMARY KEY, status TEXT, title TEXT, created_at REAL);
+CREATE INDEX job_status_created ON job (status, created_at);
+CREATE TABLE saved (id INTEGER PRIMARY KEY, user_id INTEGER, job_id INTEGER,
+                    UNIQUE (user_id, job_id));
+'''
+READ = "SELECT id, title FROM job WHERE status = 'active' ORDER BY created_at DESC LIMIT 20"
+
+
+def profiles():
+    """the plain django defaults against the settings in jobportal/settings.py"""
+    options = settings.DATABASES['default'].get('OPTIONS', {})
+    return {
+        'before': {
+            'pragmas': [],
+            'begin': 'BEGIN',
+            'timeout': 5.0,  # sqlite3 module default
+            'persistent': False,
+        },
+        'after': {
+            'pragmas': [command for command in options.get('init_command', '').split(';')
+                        if command.strip()],
+            'begin': f"BEGIN {options.get('transaction_mode', 'DEFERRED')}",
+            'timeout': options.get('timeout', 5.0),
+            'persistent': bool(settings.DATABASES['default'].get('CONN_MAX_AGE')),
+        },
+    }
+
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    for pragma in profile['pragmas']:
+        conn.execute(pragma)
+    return conn
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def reader(path, profile, seconds, results):
+    conn = connect(path, profile)
+    reads = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        # without persistent connections every request opens a new one
+        if not profile['persistent']:
+            conn.close()
+            conn = connect(path, profile)
+        conn.execute(READ).fetchall()
+        reads += 1
+    conn.close()
+    results.put(('read', reads, [], 0))
+
+
+def writer(path, profile, seconds, user_id, jobs, results):
+    conn = connect(path, profile)
+    waits, errors = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if not profile['persistent']:
+            conn.close()
+            conn = connect(path, profile)
+        job_id = random.randint(1, jobs)
+        started = time.monotonic()
+        try:
+            # toggle_save: look the save up, then add or remove it
+            conn.execute(profile['begin'])
+            found = conn.execute('SELECT id FROM saved WHERE user_id = ? AND job_id = ?',
+                                 (user_id, job_id)).fetchone()
+            if found:
+                conn.execute('DELETE FROM saved WHERE id = ?', found)
+            else:
+                conn.execute('INSERT INTO saved (user_id, job_id) VALUES (?, ?)',
+                             (user_id, job_id))
+            conn.execute('COMMIT')
+            waits.append(time.monotonic() - started)
+        except sqlite3.OperationalError:
+            # "database is locked", what users see as a 500
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            errors += 1
+    conn.close()
+    results.put(('write', len(waits), waits, errors))
+
+
+class Command(BaseCommand):
+    help = 'Measure sqlite read throughput and write lock waits, default vs tuned settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--jobs', type=int, default=5000,
+                            help='rows in the scratch job table')
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers, "
+            f"{options['seconds']}s per profile\n")
+        self.stdout.write(f"{'profile':<8} {'reads/s':>9} {'writes/s':>9} "
+                          f"{'wait p50':>9} {'wait p95':>9} {'wait max':>9} {'locked':>7}")
+
+        for name, profile in profiles().items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, profile, options['jobs'])
+
+                results = context.Queue()
+                processes = [
+                    context.Process(target=reader, args=(
+                        path, profile, options['seconds'], results))
+                    for _ in range(options['readers'])
+                ] + [
+                    context.Process(target=writer, args=(
+                        path, profile, options['seconds'], user_id, options['jobs'], results))
+                    for user_id in range(options['writers'])
+                ]
+                for process in processes:
+                    process.start()
+                collected = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+
+            reads = sum(count for kind, count, _, _ in collected if kind == 'read')
+            writes = sum(count for kind, count, _, _ in collected if kind == 'write')
+            waits = [wait for _, _, found, _ in collected for wait in found]
+            errors = sum(error for _, _, _, error in collected)
+            seconds = options['seconds']
+            self.stdout.write(
+                f'{name:<8} {reads / seconds:>9.0f} {writes / seconds:>9.0f} '
+                f'{percentile(waits, 0.5) * 1000:>7.2f}ms {percentile(waits, 0.95) * 1000:>7.2f}ms '
+                f'{max(waits, default=0) * 1000:>7.2f}ms {errors:>7}')
+
+    def seed(self, path, profile, jobs):
+        conn = connect(path, profile)
+        conn.executescript(SCHEMA)
+        now = time.time()
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO job (status, title, created_at) VALUES (?, ?, ?)',
+            ((random.choice(['active', 'active', 'closed']), f'Job {i}', now - i)
+             for i in range(jobs)))
+        conn.execute('COMMIT')
+        conn.close()
@@ -0,0 +1,219 @@
+import json
+import platform
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+
+from main import seeding
+from main.urls import urlpatterns
+
+# routes that change data or only take a POST, requesting them in a loop
+# would measure a redirect or change what the other views show
+SKIPPED = {
+    'logout', 'toggle_save', 'toggle_job_status', 'delete_job',
+    'bulk_update_applications', 'accept_application', 'reject_application',
+}
+
+# extra query strings worth timing on their own
+VARIANTS = {
+    'job_list': [
+        '?search=python',
+        '?search=developer&sort=relevance',
+        '?location=bulacan&workplace=onsite&work_type=internship',
+        '?date_posted=7days',
+        '?sort=pay&min_pay=20000',
+    ],
+    'job_autocomplete': ['?q=pyt'],
+    'applied_jobs': ['?status=pending'],
+    'saved_jobs': ['?status=active'],
+    'my_jobs': ['?status=active'],
+    'view_applications': ['?status=pending'],
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def role(pattern):
+    """who requests the page, by the url prefix"""
+    route = str(pattern.pattern)
+    if route.startswith(('student/', 'jobs/state/', 'saved/')):
+        return 'student'
+    if route.startswith(('employer/', 'application/')):
+        return 'employer'
+    return 'anonymous'
+
+
+def url_kwargs(pattern, data):
+    ids = {'job_id': data['job'].id, 'app_id': data['application'].id}
+    return {name: ids[name] for name in pattern.pattern.converters}
+
+
+def body_size(response):
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+        return size
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every page in main/urls.py with the test client and report '
+        'p50/p95 latency, query count and bytes rendered per view'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='timed requests per url')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='untimed requests per url first, to fill caches')
+        parser.add_argument('--json', dest='json_path',
+                            help='also write the results to this file')
+        parser.add_argument('--compare', dest='compare_path',
+                            help='show the change against an earlier --json file')
+        parser.add_argument('--current-db', action='store_true',
+                            help='use the configured database instead of seeding a throwaway one')
+        parser.add_argument('--employers', type=int, default=20)
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--jobs', type=int, default=500)
+        parser.add_argument('--applications', type=int, default=2000)
+        parser.add_argument('--saves', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1,
+                            help='random seed for the throwaway data')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+
+        previous = None
+        if options['compare_path']:
+            with open(options['compare_path']) as f:
+                previous = {row['url']: row for row in json.load(f)['views']}
+
+        setup_test_environment()
+        old_name = None
+        if not options['current_db']:
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if not options['current_db']:
+                seeding.seed(
+                    employers=options['employers'], students=options['students'],
+                    jobs=options['jobs'], applications=options['applications'],
+                    saves=options['saves'], seed=options['seed'])
+            data = seeding.sample_data()
+            if data is None:
+                raise CommandError('No applications found, run seed_data first.')
+            meta = self.get_meta(options)
+            rows, skipped = self.run(data, options['repeat'], options['warmup'])
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(rows, skipped, previous)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({'meta': meta, 'views': rows, 'skipped': skipped}, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+    def get_meta(self, options):
+        from main.models import Application, Job, Saved, User
+
+        return {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'current_db': options['current_db'],
+            'repeat': options['repeat'],
+            'warmup': options['warmup'],
+            'rows': {
+                'users': User.objects.count(),
+                'jobs': Job.objects.count(),
+                'applications': Application.objects.count(),
+                'saves': Saved.objects.count(),
+            },
+        }
+
+    def get_urls(self, data):
+        """(view name, role, url) for every GET route and its variants"""
+        urls, skipped = [], []
+        for pattern in urlpatterns:
+            if pattern.name in SKIPPED:
+                skipped.append(pattern.name)
+                continue
+            url = reverse(pattern.name, kwargs=url_kwargs(pattern, data))
+            if pattern.name == 'job_state':
+                url += f"?ids={data['job'].id}"
+            for query in [''] + VARIANTS.get(pattern.name, []):
+                urls.append((pattern.name, role(pattern), url + query))
+        return urls, skipped
+
+    def run(self, data, repeat, warmup):
+        clients = {'anonymous': Client(), 'student': Client(), 'employer': Client()}
+        clients['student'].force_login(data['student'])
+        clients['employer'].force_login(data['employer'])
+
+        urls, skipped = self.get_urls(data)
+        rows = []
+        for name, who, url in urls:
+            client = clients[who]
+            for _ in range(warmup):
+                body_size(client.get(url))
+
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    size = body_size(response)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+            rows.append({
+                'view': name,
+                'role': who,
+                'url': url,
+                'status': response.status_code,
+                'p50_ms': round(percentile(timings, 0.5), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                # queries and bytes of the last, warmed up request
+                'queries': len(queries),
+                'bytes': size,
+            })
+        return rows, skipped
+
+    def report(self, rows, skipped, previous):
+        self.stdout.write(f"{'view':<26} {'role':<9} {'status':>6} {'p50 ms':>8} "
+                          f"{'p95 ms':>8} {'queries':>7} {'bytes':>8}  url")
+        for row in rows:
+            line = (f"{row['view']:<26} {row['role']:<9} {row['status']:>6} "
+                    f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                    f"{row['queries']:>7} {row['bytes']:>8}  {row['url']}")
+            before = previous.get(row['url']) if previous else None
+            if before:
+                line += self.change(row, before)
+            self.stdout.write(line)
+        if skipped:
+            self.stdout.write(f"Skipped (POST only or changes data): {', '.join(skipped)}")
+
+    def change(self, row, before):
+        """p50 and queries against the earlier run, slower or more queries in red"""
+        p50 = row['p50_ms'] - before['p50_ms']
+        queries = row['queries'] - before['queries']
+        text = f'  ({p50:+.2f} ms, {queries:+d} queries)'
+        worse = queries > 0 or p50 > max(1.0, before['p50_ms'] * 0.2)
+        return self.style.ERROR(text) if worse else text
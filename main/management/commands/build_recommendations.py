@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from main import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute the job recommendations of every student'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=recommendations.BATCH_SIZE,
+                            help='student-job pairs scored together, bounds memory')
+
+    def handle(self, *args, **options):
+        count = recommendations.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} recommendations.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main import similar
+
+
+class Command(BaseCommand):
+    help = 'Recompute the similar jobs shown on every job page'
+
+    def handle(self, *args, **options):
+        count = similar.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} similar jobs.'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from main import thumbnails
+from main.models import EmployerProfile, StudentProfile
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails of company logos and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='regenerate thumbnails that already exist')
+
+    def handle(self, *args, **options):
+        images = [
+            (EmployerProfile.objects.exclude(logo='').exclude(logo__isnull=True), 'logo'),
+            (StudentProfile.objects.exclude(profile_img='').exclude(
+                profile_img__isnull=True), 'profile_img'),
+        ]
+
+        generated = skipped = failed = 0
+        for queryset, field in images:
+            thumbnailed = f'{field}_thumbnailed'
+            for profile in queryset.only('id', field, thumbnailed).iterator():
+                image = getattr(profile, field)
+                if not options['force'] and getattr(profile, thumbnailed) == image.name:
+                    skipped += 1
+                    continue
+                if not options['force'] and thumbnails.exists(image):
+                    # made before the name was recorded, pages still show
+                    # the original until it is
+                    thumbnails.record(profile, field)
+                    skipped += 1
+                    continue
+                try:
+                    thumbnails.generate(image)
+                except OSError as e:
+                    # missing or broken upload, keep going with the rest
+                    self.stderr.write(f'{image.name}: {e}')
+                    failed += 1
+                else:
+                    thumbnails.record(profile, field)
+                    generated += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated thumbnails for {generated} images, '
+            f'{skipped} already done, {failed} failed.'))
@@ -0,0 +1,182 @@
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from django.utils import timezone
+
+from main.models import (Application, EmployerProfile, Job, Saved,
+                         StudentProfile, UserProfile)
+from main.pagination import encode_cursor
+
+# a plan step like "SCAN main_job" reads every row of the table,
+# "SCAN main_job USING INDEX ..." and "SEARCH ..." are fine
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database, request every view and run EXPLAIN QUERY '
+        'PLAN on each query, fails if a query falls back to a full table scan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=50,
+                            help='number of jobs to seed')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='print the plan of every query')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN checks need SQLite.')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            data = self.seed(options['jobs'])
+            scans = self.check_views(data, options['verbose_plans'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if scans:
+            raise CommandError(f'{scans} queries use a full table scan.')
+        self.stdout.write(self.style.SUCCESS('No full table scans found.'))
+
+    def seed(self, job_count):
+        employer = self.create_user('employer@example.com', 'employer')
+        EmployerProfile.objects.create(
+            user_profile=employer.userprofile, company_name='Acme',
+            phone='+63 912 345 6789', company_address='Malolos, Bulacan',
+            industry='IT', company_size='11-50', description='Acme Inc.')
+
+        student = self.create_user('student@example.com', 'student')
+        StudentProfile.objects.create(
+            user_profile=student.userprofile, first_name='Juan',
+            last_name='Cruz', phone='+63 912 345 6789', school='BulSU',
+            course='BSIT', year_level='4', skills='Python, SQL')
+
+        now = timezone.now()
+        jobs = []
+        for i in range(job_count):
+            job = Job.objects.create(
+                employer=employer, title=f'Python Developer {i}',
+                location='Malolos, Bulacan', workplace='onsite',
+                work_type='internship', pay_type='monthly',
+                pay_min=15000, pay_max=20000,
+                job_description='<div>Build <b>Django</b> apps</div>',
+                status='closed' if i % 5 == 0 else 'active')
+            Job.objects.filter(id=job.id).update(
+                created_at=now - timedelta(hours=i))
+            jobs.append(job)
+
+        for job in jobs[::2]:
+            Application.objects.create(
+                job=job, applicant=student, resume='resumes/resume.pdf')
+        for job in jobs[::3]:
+            Saved.objects.create(user=student, job=job)
+
+        return {'employer': employer, 'student': student, 'job': jobs[1]}
+
+    def create_user(self, email, role):
+        user = User.objects.create_user(
+            username=email, email=email, password='password')
+        UserProfile.objects.create(user=user, role=role)
+        return user
+
+    def get_urls(self, data):
+        job_id = data['job'].id
+        # deeper pages seek from a cursor, forwards and back
+        newest = ('created_at', 'id')
+        by_pay = ('annual_pay_max', 'id')
+        cursors = [
+            f"cursor={encode_cursor(data['job'], newest, 'n')}",
+            f"cursor={encode_cursor(data['job'], newest, 'p')}",
+            f"sort=pay&cursor={encode_cursor(data['job'], by_pay, 'n')}",
+            f"sort=pay&cursor={encode_cursor(data['job'], by_pay, 'p')}",
+        ]
+        public = [
+            '/',
+            '/jobs/',
+            '/jobs/?search=python',
+            '/jobs/?search=python&sort=relevance',
+            '/jobs/?location=malolos&workplace=onsite&work_type=internship',
+            '/jobs/?date_posted=7days',
+            '/jobs/?sort=pay&min_pay=10000',
+            '/jobs/?max_pay=50000',
+            '/jobs/feed/',
+            *[f'/jobs/?{query}' for query in cursors],
+            *[f'/jobs/feed/?{query}' for query in cursors],
+            f'/jobs/partial/{job_id}/',
+            f'/jobs/{job_id}/',
+        ]
+        student = [
+            '/jobs/',
+            '/student/applied/',
+            '/student/applied/?status=pending',
+            '/student/saved/',
+            '/student/saved/?status=active',
+            '/student/profile',
+            f'/student/apply/{job_id}/',
+            f'/jobs/partial/{job_id}/',
+            f'/jobs/state/?ids={job_id},{job_id + 1},{job_id + 2}',
+        ]
+        employer = [
+            '/employer/my-jobs/',
+            '/employer/my-jobs/?status=active',
+            f'/employer/applications/{job_id}/',
+            f'/employer/applications/{job_id}/?status=pending',
+            f'/employer/edit/{job_id}/',
+            '/employer/profile',
+            '/employer/create/',
+        ]
+        return [
+            (None, public),
+            (data['student'], student),
+            (data['employer'], employer),
+        ]
+
+    def check_views(self, data, verbose_plans):
+        self.table_names = set(connection.introspection.table_names())
+        scans = 0
+        for user, urls in self.get_urls(data):
+            client = Client()
+            if user:
+                client.force_login(user)
+            who = user.userprofile.role if user else 'anonymous'
+
+            for url in urls:
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+
+                self.stdout.write(
+                    f'{who:<10} {url} -> {response.status_code}, '
+                    f'{len(queries)} queries')
+
+                for query in queries.captured_queries:
+                    scans += self.check_query(query['sql'], verbose_plans)
+
+        return scans
+
+    def check_query(self, sql, verbose_plans):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[3] for row in cursor.fetchall()]
+
+        # derived tables such as "SCAN subquery" are not real tables
+        tables = [match.group(1) for match in map(FULL_SCAN.match, plan)
+                  if match and match.group(1) in self.table_names]
+        if verbose_plans or tables:
+            style = self.style.ERROR if tables else self.style.HTTP_INFO
+            self.stdout.write(style(f'    {sql}'))
+            for step in plan:
+                self.stdout.write(f'      {step}')
+        return len(tables)
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from main import resumes
+
+
+class Command(BaseCommand):
+    help = 'Delete stored resumes no application or profile uses anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='keep files newer than this, uploads in progress')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='list the files without deleting them')
+
+    def handle(self, *args, **options):
+        removed = resumes.collect_garbage(
+            grace=timedelta(hours=options['grace_hours']),
+            dry_run=options['dry_run'])
+
+        for name in removed:
+            self.stdout.write(name)
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(removed)} resumes.'))
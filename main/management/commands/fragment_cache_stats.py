@@ -0,0 +1,37 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from main import fragments
+
+
+class Command(BaseCommand):
+    help = (
+        'Show hit/miss counters of the rendered job card and panel cache. '
+        'Needs a cache shared with the server processes (redis, memcached, '
+        'database or file based)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='set the counters back to zero')
+
+    def handle(self, *args, **options):
+        # each server process counts in its own memory, this command
+        # would only ever see its own empty cache
+        if isinstance(caches['default'], LocMemCache):
+            raise CommandError(
+                'The default cache is LocMemCache, which is private to each '
+                'process, so the server\'s counters can\'t be read from here. '
+                'Set CACHES to a shared backend such as redis or memcached.')
+
+        for kind, stats in fragments.get_stats().items():
+            total = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / total * 100 if total else 0
+            self.stdout.write(
+                f'{kind:<6} {stats["hits"]} hits, {stats["misses"]} misses '
+                f'({ratio:.1f}% hit rate)')
+
+        if options['reset']:
+            fragments.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from main import counters
+from main.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Recount applications per job and repair drifted job counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, action='append', dest='job_ids',
+                            help='only check this job id, can be repeated')
+
+    def handle(self, *args, **options):
+        jobs = Job.objects.all()
+        if options['job_ids']:
+            jobs = jobs.filter(id__in=options['job_ids'])
+
+        fixed = counters.reconcile(jobs)
+        if fixed:
+            self.stdout.write(self.style.WARNING(
+                f'Repaired application counters on {fixed} jobs.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All application counters match.'))
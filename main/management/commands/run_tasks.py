@@ -0,0 +1,74 @@
+import multiprocessing
+import signal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main import taskqueue
+
+
+def run_worker(options):
+    """one worker loop, finishes the current task on SIGINT/SIGTERM"""
+    stopping = []
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopping.append(True))
+
+    taskqueue.work(
+        lambda: bool(stopping),
+        batch_size=options['batch_size'],
+        poll_interval=options['poll_interval'],
+        visibility_timeout=options['visibility_timeout'])
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='worker processes')
+        parser.add_argument('--once', action='store_true',
+                            help='run the tasks that are due and exit')
+        parser.add_argument('--batch-size', type=int, default=taskqueue.BATCH_SIZE,
+                            help='tasks a worker claims at once')
+        parser.add_argument('--poll-interval', type=float, default=taskqueue.POLL_INTERVAL,
+                            help='seconds an idle worker waits')
+        parser.add_argument('--visibility-timeout', type=int,
+                            default=taskqueue.VISIBILITY_TIMEOUT,
+                            help='seconds before a task held by a dead worker is retried')
+        parser.add_argument('--prune-days', type=int,
+                            help='first delete tasks finished more than this many days ago')
+
+    def handle(self, *args, **options):
+        if options['prune_days'] is not None:
+            pruned = taskqueue.prune(timedelta(days=options['prune_days']))
+            self.stdout.write(f'Pruned {pruned} finished tasks.')
+
+        if options['once']:
+            count = taskqueue.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} tasks.'))
+            return
+
+        if options['workers'] <= 1:
+            run_worker(options)
+            return
+
+        # children must not share the parent's database connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=run_worker, args=(options,))
+                     for _ in range(options['workers'])]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {len(processes)} workers.')
+
+        # ctrl-c reaches the whole process group, pass SIGTERM on
+        def stop(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        for process in processes:
+            process.join()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from main import seeding
+
+
+class Command(BaseCommand):
+    help = 'Add a realistic dataset of employers, students, jobs, applications and saves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employers', type=int, default=20)
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--jobs', type=int, default=500)
+        parser.add_argument('--applications', type=int, default=2000)
+        parser.add_argument('--saves', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=seeding.BATCH_SIZE,
+                            help='rows per INSERT')
+        parser.add_argument('--seed', type=int,
+                            help='random seed, the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        counts = seeding.seed(
+            employers=options['employers'], students=options['students'],
+            jobs=options['jobs'], applications=options['applications'],
+            saves=options['saves'], batch_size=options['batch_size'],
+            seed=options['seed'])
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Added {summary}.'))
+        self.stdout.write(f'Every seeded user logs in with "{seeding.PASSWORD}".')
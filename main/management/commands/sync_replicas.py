@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.routers import replica_weights
+
+
+class Command(BaseCommand):
+    help = 'Copy the default sqlite database into the replica databases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='keep copying every this many seconds')
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']
+        replicas = [settings.DATABASES[alias] for alias in replica_weights()]
+        if not replicas:
+            raise CommandError('No replicas in DATABASE_REPLICAS.')
+        for database in [source] + replicas:
+            if database['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('Only sqlite files can be copied, use the '
+                                   "database's own replication instead.")
+
+        while True:
+            started = time.monotonic()
+            self.copy(source, replicas)
+            self.stdout.write(
+                f'Copied to {len(replicas)} replicas in '
+                f'{(time.monotonic() - started) * 1000:.0f}ms.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source, replicas):
+        # the backup api copies a consistent snapshot while the site keeps
+        # writing, and replica readers see the old or the new copy, never half
+        primary = sqlite3.connect(source['NAME'], timeout=20)
+        try:
+            for replica in replicas:
+                target = sqlite3.connect(replica['NAME'], timeout=20)
+                try:
+                    primary.backup(target)
+                finally:
+                    target.close()
+        finally:
+            primary.close()
@@ -1,5 +1,14 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.shortcuts import redirect
 
+from . import profiling
+from .identity import get_identity
+from .routers import PIN_COOKIE, replica_weights
+
 
 class RoleBasedAccessMiddleware:
     def __init__(self, get_response):
@@ -8,20 +17,85 @@ class RoleBasedAccessMiddleware:
     def __call__(self, request):
         path = request.path
 
-        # only check for authenticated users
-        if request.user.is_authenticated:
-            user_profile = getattr(request.user, 'userprofile', None)
+        # only role restricted routes touch the session, so public pages
+        # don't get "Vary: Cookie" and stay cacheable
+        restricted = path.startswith('/student/') or path.startswith('/employer/')
+
+        # role comes from the session, no user or profile query
+        identity = get_identity(request) if restricted else None
 
-            # proceed only if user has profile
-            if user_profile:
-                role = user_profile.role
+        # proceed only if user has profile
+        if identity and identity['role']:
+            role = identity['role']
 
-                # block employers from student route
-                if path.startswith('/student/') and role != 'student':
-                    return redirect('home')
+            # block employers from student route
+            if path.startswith('/student/') and role != 'student':
+                return redirect('home')
 
-                # block students from employer route
-                if path.startswith('/employer/') and role != 'employer':
-                    return redirect('home')
+            # block students from employer route
+            if path.startswith('/employer/') and role != 'employer':
+                return redirect('home')
 
         return self.get_response(request)
+
+
+class PrimaryPinMiddleware:
+    """
+    after a write (apply, save, edit job) read from the primary for a few
+    seconds, so the user sees their change before the replicas catch up
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (request.method not in self.SAFE_METHODS and replica_weights()
+                and response.status_code < 500):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    a sample of requests gets a Server-Timing header with sql, template and
+    view time, requests slower than PROFILING_SLOW_MS go to the slow log.
+    taken out of the stack at startup when both are turned off
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.slow_ms = settings.PROFILING_SLOW_MS
+        if not self.sample_rate and self.slow_ms is None:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        profile = None
+        if self.sample_rate and random.random() < self.sample_rate:
+            with profiling.collect(profiling.Profile()) as profile:
+                response = self.get_response(request)
+                if profile.view_started is not None:
+                    # the view and the response half of the middleware below
+                    profile.view_time = time.perf_counter() - profile.view_started
+        else:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        if profile is not None:
+            response['Server-Timing'] = profile.server_timing()
+        if self.slow_ms is not None and total_ms >= self.slow_ms:
+            profiling.log_slow(request, response, total_ms, profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # the rest of the stack ran its request half, time the view from here
+        profile = profiling.current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+from main.search import html_to_text
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE main_job_fts USING fts5("
+        "title, company_name, summary, description, "
+        "tokenize='porter unicode61', prefix='2 3')"
+    )
+
+    # index jobs that already exist
+    Job = apps.get_model('main', 'Job')
+    EmployerProfile = apps.get_model('main', 'EmployerProfile')
+    companies = dict(EmployerProfile.objects.values_list(
+        'user_profile__user_id', 'company_name'))
+
+    rows = [
+        (job.id, job.title, companies.get(job.employer_id, ''),
+         job.summary or '', html_to_text(job.job_description))
+        for job in Job.objects.all()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO main_job_fts '
+            '(rowid, title, company_name, summary, description) '
+            'VALUES (%s, %s, %s, %s, %s)', rows)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS main_job_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Round
+
+PAY_PERIODS_PER_YEAR = {
+    'hourly': 2080,
+    'monthly': 12,
+    'annual': 1,
+    'annual-plus': 1,
+}
+
+
+def annual_pay(field):
+    output = models.DecimalField(max_digits=14, decimal_places=2)
+    whens = [
+        When(pay_type=pay_type, then=F(field) * Value(periods))
+        for pay_type, periods in PAY_PERIODS_PER_YEAR.items()
+    ]
+    return Case(*whens, default=F(field) * Value(12), output_field=output)
+
+
+def backfill_pay(apps, schema_editor):
+    Job = apps.get_model('main', 'Job')
+    Job.objects.update(
+        annual_pay_min=Round(annual_pay('pay_min'), 2),
+        annual_pay_max=Round(annual_pay('pay_max'), 2),
+        monthly_pay_min=Round(annual_pay('pay_min') / Value(12), 2),
+        monthly_pay_max=Round(annual_pay('pay_max') / Value(12), 2),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='annual_pay_max',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='annual_pay_min',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='monthly_pay_max',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='monthly_pay_min',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', '-annual_pay_max', '-id'], name='job_status_pay_max_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'annual_pay_min'], name='job_status_pay_min_idx'),
+        ),
+        migrations.RunPython(backfill_pay, migrations.RunPython.noop),
+    ]
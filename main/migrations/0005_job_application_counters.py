@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+STATUS_COUNTERS = {
+    'pending': 'pending_count',
+    'accepted': 'accepted_count',
+    'rejected': 'rejected_count',
+}
+
+
+def backfill_counters(apps, schema_editor):
+    Application = apps.get_model('main', 'Application')
+    Job = apps.get_model('main', 'Job')
+
+    def counted(status=None):
+        applications = Application.objects.filter(job=OuterRef('pk'))
+        if status:
+            applications = applications.filter(status=status)
+        return Coalesce(Subquery(
+            applications.values('job').annotate(total=Count('id')).values('total')
+        ), 0)
+
+    Job.objects.update(
+        application_count=counted(),
+        **{field: counted(status) for status, field in STATUS_COUNTERS.items()},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_job_normalized_pay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='accepted_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='application_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='pending_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='rejected_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
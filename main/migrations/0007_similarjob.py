@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='main.job')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='main.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-score'], name='similar_job_score_idx')],
+                'unique_together': {('job', 'similar')},
+            },
+        ),
+    ]
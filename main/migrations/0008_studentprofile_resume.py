@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_similarjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='resume',
+            field=models.FileField(blank=True, null=True, upload_to='resumes/'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=120)),
+                ('weight', models.FloatField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='main.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'job'], name='job_term_term_idx')],
+                'unique_together': {('job', 'term')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_jobterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employerprofile',
+            name='logo_thumbnailed',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='profile_img_thumbnailed',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
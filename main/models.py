@@ -1,6 +1,10 @@
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth.models import User
 
+from . import thumbnails
+
 
 class UserProfile(models.Model):
     ROLE_CHOICES = [
@@ -29,6 +33,8 @@ class StudentProfile(models.Model):
     user_profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE)
     profile_img = models.ImageField(
         upload_to='user_profile_img/', blank=True, null=True)
+    # profile_img name its thumbnails were made from, see main/thumbnails.py
+    profile_img_thumbnailed = models.CharField(max_length=100, blank=True)
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
     phone = models.CharField(max_length=20)
@@ -38,10 +44,17 @@ class StudentProfile(models.Model):
         max_length=20, choices=YEAR_LEVEL_CHOICES)
     skills = models.TextField(blank=True, help_text="Comma-separated skills")
     bio = models.TextField(blank=True, max_length=1000)
+    # last uploaded resume, offered again on the next application
+    resume = models.FileField(upload_to='resumes/', blank=True, null=True)
 
     def __str__(self):
         return self.user_profile.user.username
 
+    @property
+    def profile_img_thumbnails(self):
+        # card, panel and avatar urls, see main/thumbnails.py
+        return thumbnails.urls(self.profile_img, self.profile_img_thumbnailed)
+
 
 class EmployerProfile(models.Model):
     COMPANY_SIZE_CHOICES = [
@@ -58,6 +71,8 @@ class EmployerProfile(models.Model):
     last_name = models.CharField(max_length=50, blank=True)
     company_name = models.CharField(max_length=200)
     logo = models.ImageField(upload_to='company_logos/', blank=True, null=True)
+    # logo name its thumbnails were made from, see main/thumbnails.py
+    logo_thumbnailed = models.CharField(max_length=100, blank=True)
     phone = models.CharField(max_length=20)
     company_address = models.CharField(max_length=300)
     industry = models.CharField(max_length=100)
@@ -68,6 +83,11 @@ class EmployerProfile(models.Model):
     def __str__(self):
         return self.user_profile.user.username
 
+    @property
+    def logo_thumbnails(self):
+        # card, panel and avatar urls, see main/thumbnails.py
+        return thumbnails.urls(self.logo, self.logo_thumbnailed)
+
 
 class Job(models.Model):
     WORKPLACE_CHOICES = [
@@ -99,6 +119,22 @@ class Job(models.Model):
         ('closed', 'Closed'),
     ]
 
+    # pay periods in a year, used to compare pay across pay types
+    # (hourly is 40 hours a week for 52 weeks)
+    PAY_PERIODS_PER_YEAR = {
+        'hourly': 2080,
+        'monthly': 12,
+        'annual': 1,
+        'annual-plus': 1,
+    }
+
+    PAY_UNITS = {
+        'hourly': 'per hour',
+        'monthly': 'per month',
+        'annual': 'per year',
+        'annual-plus': 'per year + commission',
+    }
+
     employer = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='jobs')
     status = models.CharField(
@@ -114,9 +150,77 @@ class Job(models.Model):
     summary = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # pay normalized from pay_type, kept up to date on save
+    annual_pay_min = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False)
+    annual_pay_max = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False)
+    monthly_pay_min = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False)
+    monthly_pay_max = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False)
+
+    # application counters, only ever changed with F() updates in
+    # main/counters.py, reconcile_application_counts repairs drift
+    application_count = models.PositiveIntegerField(default=0, editable=False)
+    pending_count = models.PositiveIntegerField(default=0, editable=False)
+    accepted_count = models.PositiveIntegerField(default=0, editable=False)
+    rejected_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = (
+        'application_count', 'pending_count', 'accepted_count', 'rejected_count',
+    )
+
+    class Meta:
+        indexes = [
+            # public job feed, active jobs newest first
+            models.Index(fields=['status', '-created_at', '-id'],
+                         name='job_status_recent_idx'),
+            # employer dashboard, my jobs newest first
+            models.Index(fields=['employer', '-created_at'],
+                         name='job_employer_recent_idx'),
+            # job list sorted by pay and min pay filter
+            models.Index(fields=['status', '-annual_pay_max', '-id'],
+                         name='job_status_pay_max_idx'),
+            # job list max pay filter
+            models.Index(fields=['status', 'annual_pay_min'],
+                         name='job_status_pay_min_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.normalize_pay()
+        update_fields = kwargs.get('update_fields')
+
+        # never write back counters loaded before someone applied
+        if (update_fields is None and not self._state.adding
+                and not kwargs.get('force_insert')):
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                'annual_pay_min', 'annual_pay_max',
+                'monthly_pay_min', 'monthly_pay_max',
+            }
+        super().save(*args, **kwargs)
+
+    def normalize_pay(self):
+        periods = self.PAY_PERIODS_PER_YEAR.get(self.pay_type, 12)
+        cents = Decimal('0.01')
+        self.annual_pay_min = (Decimal(self.pay_min) * periods).quantize(cents)
+        self.annual_pay_max = (Decimal(self.pay_max) * periods).quantize(cents)
+        self.monthly_pay_min = (self.annual_pay_min / 12).quantize(cents)
+        self.monthly_pay_max = (self.annual_pay_max / 12).quantize(cents)
+
+    @property
+    def pay_unit(self):
+        return self.PAY_UNITS.get(self.pay_type, 'per month')
+
 
 class Application(models.Model):
     STATUS_CHOICES = [
@@ -137,10 +241,26 @@ class Application(models.Model):
     class Meta:
         # prevent duplicate applications
         unique_together = ('job', 'applicant')
+        indexes = [
+            # student applied jobs, newest first
+            models.Index(fields=['applicant', '-applied_at'],
+                         name='app_applicant_recent_idx'),
+            # employer applicants list, newest first
+            models.Index(fields=['job', '-applied_at'],
+                         name='app_job_recent_idx'),
+        ]
 
     def __str__(self):
         return self.applicant.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # status as loaded, so a save knows which job counter to move
+        if 'status' in field_names:
+            instance.loaded_status = values[field_names.index('status')]
+        return instance
+
 
 class Saved(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -149,6 +269,109 @@ class Saved(models.Model):
 
     class Meta:
         unique_together = ('user', 'job')
+        indexes = [
+            # saved jobs page, newest first
+            models.Index(fields=['user', '-created_at'],
+                         name='saved_user_recent_idx'),
+        ]
 
     def __str__(self):
         return self.user.username
+
+
+class Recommendation(models.Model):
+    # precomputed by main/recommendations.py, read as is by the home page
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='recommendations')
+    job = models.ForeignKey(
+        Job, on_delete=models.CASCADE, related_name='recommendations')
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'job')
+        indexes = [
+            # home page, best matches first
+            models.Index(fields=['user', '-score'],
+                         name='rec_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.job.title}'
+
+
+class SimilarJob(models.Model):
+    # nearest neighbors from main/similar.py, read as is by the job page
+    job = models.ForeignKey(
+        Job, on_delete=models.CASCADE, related_name='neighbors')
+    similar = models.ForeignKey(
+        Job, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('job', 'similar')
+        indexes = [
+            # job page, closest jobs first
+            models.Index(fields=['job', '-score'],
+                         name='similar_job_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.job.title} - {self.similar.title}'
+
+
+class JobTerm(models.Model):
+    # tf-idf weight of a word in an active job, from main/similar.py. kept
+    # by term so an edited job is scored without re-reading every other one
+    job = models.ForeignKey(
+        Job, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=120)
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = ('job', 'term')
+        indexes = [
+            # postings of a term, and its document frequency
+            models.Index(fields=['term', 'job'], name='job_term_term_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.job_id} - {self.term}'
+
+
+class Task(models.Model):
+    # background work run by the run_tasks command, see main/taskqueue.py
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    ]
+
+    name = models.CharField(max_length=200)  # dotted path of the function
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    # a running task whose lock ran out is picked up again
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # workers, due tasks oldest first
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at_idx'),
+            # workers, running tasks whose lock expired
+            models.Index(fields=['status', 'locked_until'],
+                         name='task_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
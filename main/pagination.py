@@ -0,0 +1,131 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    one page of a keyset paginated queryset, works like a paginator page
+    in templates but has cursors instead of page numbers
+    """
+    paginator = None
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def encode_cursor(obj, keys, direction):
+    """opaque cursor pointing before (p) or after (n) an object"""
+    values = [str(getattr(obj, key)) for key in keys]
+    raw = json.dumps([values, direction], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, keys):
+    """return (values, direction) or None if the cursor is invalid"""
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values, direction = json.loads(raw)
+        if len(values) != len(keys):
+            return None
+        values = [model._meta.get_field(key).to_python(value)
+                  for key, value in zip(keys, values)]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+    if direction not in ('n', 'p'):
+        return None
+    return values, direction
+
+
+def seek_q(keys, values, lookup):
+    """
+    rows strictly after the cursor in (k1, k2, ...) order, e.g.
+    k1 <= v1 AND (k1 < v1 OR (k1 = v1 AND k2 < v2))
+    """
+    condition = Q()
+    for i, key in enumerate(keys):
+        step = Q(**{f'{key}__{lookup}': values[i]})
+        for previous, value in zip(keys[:i], values[:i]):
+            step &= Q(**{previous: value})
+        condition |= step
+    # the OR alone can't use an index range, this bound on the first key
+    # lets sqlite seek straight to the cursor instead of walking past
+    # every earlier row
+    return Q(**{f'{keys[0]}__{lookup}e': values[0]}) & condition
+
+
+def keyset_paginate(queryset, cursor=None, per_page=20,
+                    keys=('created_at', 'id')):
+    """
+    paginate in descending keys order (newest first by default), every
+    page is a range query on an index so deep pages cost the same as the
+    first one and no COUNT(*) is needed. the last key must be unique
+    """
+    newest_first = [f'-{key}' for key in keys]
+    oldest_first = list(keys)
+    position = decode_cursor(cursor, queryset.model, keys)
+
+    if position is None:
+        rows = list(queryset.order_by(*newest_first)[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], keys, 'n') if has_more else None,
+        )
+
+    values, direction = position
+
+    if direction == 'n':
+        rows = list(queryset.filter(seek_q(keys, values, 'lt')).order_by(
+            *newest_first)[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], keys, 'n') if has_more else None,
+            previous_cursor=encode_cursor(rows[0], keys, 'p') if rows else None,
+        )
+
+    # walk back towards the first page, then flip to descending order
+    rows = list(queryset.filter(seek_q(keys, values, 'gt')).order_by(
+        *oldest_first)[:per_page + 1])
+    has_more = len(rows) > per_page
+
+    # reached the first page, show it in full instead of a short one
+    if not has_more:
+        return keyset_paginate(queryset, per_page=per_page, keys=keys)
+
+    rows = rows[:per_page][::-1]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], keys, 'n') if rows else None,
+        previous_cursor=encode_cursor(rows[0], keys, 'p') if has_more else None,
+    )
@@ -0,0 +1,136 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+SLOW_LOG_QUERIES = 10  # duplicated query shapes kept per slow log entry
+
+# set while a sampled request runs, see ProfilingMiddleware
+current = ContextVar('profile', default=None)
+
+_render = Template.render
+# sampled requests running, Template.render is wrapped while there are any
+_lock = threading.Lock()
+_sampled = 0
+
+
+class Profile:
+    """sql and template time of one request"""
+
+    def __init__(self):
+        self.queries = []  # (sql, seconds)
+        self.template_time = 0.0
+        self.rendering = False
+        self.view_started = None  # set by ProfilingMiddleware.process_view
+        self.view_time = None
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def db_time(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def duplicated(self, limit=SLOW_LOG_QUERIES):
+        """queries run more than once with different params, slowest first"""
+        shapes = defaultdict(list)
+        for sql, seconds in self.queries:
+            shapes[sql].append(seconds)
+        found = sorted(((sum(times), len(times), sql) for sql, times in shapes.items()
+                        if len(times) > 1), reverse=True)
+        return [{'count': count, 'ms': round(seconds * 1000, 2), 'sql': sql}
+                for seconds, count, sql in found[:limit]]
+
+    def server_timing(self):
+        timings = [f'db;dur={self.db_time * 1000:.1f};desc="{len(self.queries)} queries"',
+                   f'tpl;dur={self.template_time * 1000:.1f}']
+        # a request that never reached a view, a 404 or a redirect by
+        # middleware, has no view time
+        if self.view_time is not None:
+            timings.append(f'view;dur={self.view_time * 1000:.1f}')
+        return ', '.join(timings)
+
+
+def render(self, context=None, request=None):
+    """template render, timed when the request is sampled"""
+    profile = current.get()
+    # templates rendered inside another one (fragments) are already counted
+    if profile is None or profile.rendering:
+        return _render(self, context, request)
+
+    profile.rendering = True
+    started = time.perf_counter()
+    try:
+        return _render(self, context, request)
+    finally:
+        profile.template_time += time.perf_counter() - started
+        profile.rendering = False
+
+
+@contextmanager
+def timed_renders():
+    """
+    wrap Template.render only while a sampled request runs, other requests
+    render through the original
+    """
+    global _sampled
+    with _lock:
+        if not _sampled:
+            Template.render = render
+        _sampled += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _sampled -= 1
+            if not _sampled:
+                Template.render = _render
+
+
+@contextmanager
+def collect(profile):
+    """record every query and render of the current request into profile"""
+    token = current.set(profile)
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(timed_renders())
+            # replicas too, read only views query them instead of default
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile.record_query))
+            yield profile
+    finally:
+        current.reset(token)
+
+
+def log_slow(request, response, total_ms, profile=None):
+    """one json line per slow request, sql details only when it was sampled"""
+    match = request.resolver_match
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(total_ms, 1),
+    }
+    if profile is not None:
+        record.update({
+            'queries': len(profile.queries),
+            'db_ms': round(profile.db_time * 1000, 1),
+            'template_ms': round(profile.template_time * 1000, 1),
+            'view_ms': (round(profile.view_time * 1000, 1)
+                        if profile.view_time is not None else None),
+            'duplicated': profile.duplicated(),
+        })
+    logger.warning(json.dumps(record))
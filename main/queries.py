@@ -0,0 +1,27 @@
+# columns a job card renders, the html description is never needed
+JOB_CARD_FIELDS = (
+    'id', 'employer', 'status', 'title', 'location', 'workplace',
+    'work_type', 'pay_type', 'pay_min', 'pay_max', 'created_at',
+    'annual_pay_max', 'monthly_pay_min', 'monthly_pay_max',
+)
+
+# path from a job to its company profile
+COMPANY = 'employer__userprofile__employerprofile'
+COMPANY_CARD_FIELDS = ('company_name', 'logo', 'logo_thumbnailed')
+
+
+def job_cards(queryset, prefix=''):
+    """
+    load everything a job card shows in one query, the job columns plus
+    the company name and logo. prefix is the path to the job when listing
+    saves or applications, e.g. job_cards(Saved.objects.all(), 'job')
+    """
+    path = f'{prefix}__' if prefix else ''
+    fields = [path + name for name in JOB_CARD_FIELDS]
+    fields += [f'{path}{COMPANY}__{name}' for name in COMPANY_CARD_FIELDS]
+
+    # keep every column of the saved or application row itself
+    if prefix:
+        fields += [field.name for field in queryset.model._meta.concrete_fields]
+
+    return queryset.select_related(path + COMPANY).only(*fields)
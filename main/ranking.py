@@ -0,0 +1,250 @@
+import re
+import threading
+import time
+
+import numpy as np
+from django.db import connection
+
+from . import caching
+from .search import html_to_text
+
+MAX_SKILL_WORDS = 3  # longest skill phrase looked up in job text, e.g. "machine learning"
+TITLE_WEIGHT = 2.0  # a skill in the job title counts more than in the description
+COMPACT_AT = 500  # updated students kept aside before the arrays are rebuilt
+REBUILD_INTERVAL = 30  # seconds before picking up profiles saved by other workers
+
+# common spellings of the same skill
+ALIASES = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'py': 'python',
+    'ms excel': 'excel',
+    'microsoft excel': 'excel',
+    'ms word': 'word',
+    'microsoft word': 'word',
+    'postgres': 'postgresql',
+    'reactjs': 'react',
+    'react.js': 'react',
+    'nodejs': 'node.js',
+    'node': 'node.js',
+}
+
+
+def normalize_skill(skill):
+    skill = ' '.join(skill.casefold().split()).strip(' .')
+    return ALIASES.get(skill, skill)
+
+
+def parse_skills(text):
+    """comma separated skills from a student profile, normalized and unique"""
+    skills = (normalize_skill(skill) for skill in re.split(r'[,;\n]', text or ''))
+    return sorted({skill for skill in skills if skill})
+
+
+def text_phrases(text):
+    """every run of up to MAX_SKILL_WORDS words, to find skills in job text"""
+    words = re.findall(r'[\w.+#]+', text.casefold())
+    words = [word.strip('.') for word in words]
+    phrases = set()
+    for size in range(1, MAX_SKILL_WORDS + 1):
+        for i in range(len(words) - size + 1):
+            phrases.add(normalize_skill(' '.join(words[i:i + size])))
+    return phrases
+
+
+def job_terms(job, vocabulary):
+    """column -> weight of every known term in the job title and description"""
+    terms = {}
+    description = html_to_text(job.job_description) + ' ' + (job.summary or '')
+    for text, weight in ((job.title, TITLE_WEIGHT), (description, 1.0)):
+        for phrase in text_phrases(text):
+            column = vocabulary.get(phrase)
+            if column is not None:
+                terms[column] = max(terms.get(column, 0.0), weight)
+    return terms
+
+
+def job_weights(job, vocabulary):
+    """dense weight per known term found in the job title and description"""
+    weights = np.zeros(len(vocabulary), dtype=np.float32)
+    terms = job_terms(job, vocabulary)
+    weights[list(terms)] = list(terms.values())
+    return weights
+
+
+class SkillMatrix:
+    """
+    student skills as a sparse 0/1 matrix (one row per student, one
+    column per known skill) stored like CSR in numpy arrays, so scoring
+    a job's applicants is a few vectorized passes, not a loop
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = False
+        self.rebuilding = False
+        self.reset()
+
+    def reset(self):
+        self.vocabulary = {}  # skill -> column
+        self.user_ids = np.zeros(0, dtype=np.int64)  # sorted, row order
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int64)
+        self.updated = {}  # user id -> columns, newer than the arrays
+        self.version = None
+        self.built_at = 0
+
+    def columns(self, skills, vocabulary=None):
+        vocabulary = self.vocabulary if vocabulary is None else vocabulary
+        for skill in skills:
+            vocabulary.setdefault(skill, len(vocabulary))
+        return np.array([vocabulary[skill] for skill in skills], dtype=np.int64)
+
+    def load(self, rows):
+        """rows of (user id, column array), replaces the arrays"""
+        rows = sorted(rows, key=lambda row: row[0])
+        lengths = np.array([len(cols) for _, cols in rows], dtype=np.int64)
+        self.user_ids = np.array([user_id for user_id, _ in rows], dtype=np.int64)
+        self.indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.indices = (np.concatenate([cols for _, cols in rows])
+                        if rows else np.zeros(0, dtype=np.int64))
+        self.updated = {}
+
+    def build(self):
+        from .models import StudentProfile
+
+        # read the version first, a profile saved while reading is picked
+        # up by the next check instead of lost
+        version = caching.get_version('student_skills')
+        vocabulary = {}
+        rows = [
+            (user_id, self.columns(parse_skills(skills), vocabulary))
+            for user_id, skills in StudentProfile.objects.values_list(
+                'user_profile__user_id', 'skills').iterator()
+        ]
+        fresh = SkillMatrix()
+        fresh.vocabulary = vocabulary
+        fresh.load(rows)
+
+        with self.lock:
+            self.vocabulary = fresh.vocabulary
+            self.user_ids, self.indptr, self.indices = (
+                fresh.user_ids, fresh.indptr, fresh.indices)
+            self.updated = {}
+            self.version = version
+            self.built = True
+            self.built_at = time.monotonic()
+
+    def rebuild_in_background(self):
+        try:
+            self.build()
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def ensure_fresh(self):
+        """
+        build on first use. when another worker saved a profile, rebuild
+        in a thread and keep scoring from the current arrays meanwhile
+        """
+        if not self.built:
+            self.build()
+        elif time.monotonic() - self.built_at > REBUILD_INTERVAL:
+            self.built_at = time.monotonic()
+            if (caching.get_version('student_skills') != self.version
+                    and not self.rebuilding):
+                self.rebuilding = True
+                threading.Thread(target=self.rebuild_in_background, daemon=True).start()
+
+    def update_student(self, user_id, skills, version=None):
+        """
+        overlay a profile saved by this worker. version is the stamp the
+        save bumped to, taken as ours when nothing else moved it meanwhile
+        """
+        if not self.built:
+            return
+        with self.lock:
+            self.updated[user_id] = self.columns(parse_skills(skills))
+            if len(self.updated) >= COMPACT_AT:
+                self.compact()
+            if (version is not None and self.version is not None
+                    and version == self.version + 1):
+                self.version = version
+
+    def compact(self):
+        """fold updated students back into the arrays, no database needed"""
+        rows = {
+            int(user_id): self.indices[self.indptr[row]:self.indptr[row + 1]]
+            for row, user_id in enumerate(self.user_ids)
+        }
+        rows.update(self.updated)
+        self.load(rows.items())
+
+    def job_weights(self, job):
+        return job_weights(job, self.vocabulary)
+
+    def score(self, job, user_ids):
+        """
+        (scores, matched skill counts, job skill count) for user_ids in the
+        same order, score is the skill overlap normalized by profile size
+        """
+        self.ensure_fresh()
+        with self.lock:
+            weights = self.job_weights(job)
+            wanted = (weights > 0).astype(np.float32)
+            user_ids = np.asarray(user_ids, dtype=np.int64)
+
+            scores = np.zeros(len(user_ids), dtype=np.float32)
+            matched = np.zeros(len(user_ids), dtype=np.float32)
+            sizes = np.zeros(len(user_ids), dtype=np.float32)
+
+            # map applicants to matrix rows, students without a profile score 0
+            positions = np.searchsorted(self.user_ids, user_ids)
+            found = positions < len(self.user_ids)
+            found[found] = self.user_ids[positions[found]] == user_ids[found]
+            rows = positions[found]
+
+            # gather the applicants' skill columns, then one weighted count
+            # per applicant is the sparse matrix times the job vector
+            starts = self.indptr[rows]
+            lengths = self.indptr[rows + 1] - starts
+            owners = np.repeat(np.arange(len(rows)), lengths)
+            offsets = np.arange(lengths.sum()) - np.repeat(
+                np.cumsum(lengths) - lengths, lengths)
+            columns = self.indices[np.repeat(starts, lengths) + offsets]
+
+            scores[found] = np.bincount(
+                owners, weights=weights[columns], minlength=len(rows))
+            matched[found] = np.bincount(
+                owners, weights=wanted[columns], minlength=len(rows))
+            sizes[found] = lengths
+
+            # the few students saved since the last compact
+            if self.updated:
+                changed = np.isin(user_ids, list(self.updated))
+                for i in np.flatnonzero(changed):
+                    columns = self.updated[int(user_ids[i])]
+                    scores[i] = weights[columns].sum()
+                    matched[i] = wanted[columns].sum()
+                    sizes[i] = len(columns)
+
+        scores = scores / np.sqrt(np.maximum(sizes, 1))
+        return scores, matched.astype(int), int(wanted.sum())
+
+
+skills = SkillMatrix()
+
+
+def rank_applications(job, applications):
+    """
+    order (application id, applicant id) pairs by skill match, best
+    first, returns [(application id, score, matched)]
+    """
+    if not applications:
+        return []
+
+    app_ids, user_ids = zip(*applications)
+    scores, matched, _ = skills.score(job, user_ids)
+    # stable sort keeps the newest first among equal scores
+    order = np.argsort(-scores, kind='stable')
+    return [(app_ids[i], float(scores[i]), int(matched[i])) for i in order]
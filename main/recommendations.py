@@ -0,0 +1,259 @@
+import re
+
+import numpy as np
+from django.db import transaction
+
+from .ranking import job_terms, parse_skills
+from .similar import gather
+
+TOP_JOBS = 20  # recommendations kept per student by the batch run
+NEW_JOB_STUDENTS = 1000  # best matching students that get a new job right away
+BATCH_SIZE = 1_000_000  # student-job pairs scored together, bounds memory
+COURSE_WEIGHT = 0.5  # course words count less than listed skills
+
+# internships suit students still in school, graduates see them lower
+INTERNSHIP_BOOST = 1.25
+GRADUATE_INTERNSHIP = 0.5
+
+# words in course names that say nothing about the field
+COURSE_STOPWORDS = {
+    'bachelor', 'master', 'science', 'arts', 'major', 'minor', 'and', 'the',
+}
+
+JOB_FIELDS = ('id', 'title', 'job_description', 'summary', 'work_type')
+
+
+def course_terms(course):
+    words = re.findall(r'[\w.+#]+', (course or '').casefold())
+    return {word for word in words if len(word) > 2 and word not in COURSE_STOPWORDS}
+
+
+class Students:
+    """
+    weighted terms (skills and course words) of many students as a CSR
+    style sparse matrix, plus whether each one already graduated
+    """
+
+    def __init__(self, profiles):
+        self.vocabulary = {}
+        user_ids, graduated, lengths, indices, weights = [], [], [], [], []
+
+        for user_id, skills, course, year_level in profiles:
+            terms = dict.fromkeys(course_terms(course), COURSE_WEIGHT)
+            terms.update(dict.fromkeys(parse_skills(skills), 1.0))
+            if not terms:
+                continue
+
+            user_ids.append(user_id)
+            graduated.append(year_level == 'graduate')
+            lengths.append(len(terms))
+            for term, weight in terms.items():
+                indices.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                weights.append(weight)
+
+        self.user_ids = np.array(user_ids, dtype=np.int64)
+        self.graduated = np.array(graduated, dtype=bool)
+        self.indptr = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        self.indices = np.array(indices, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float32)
+
+        # row lengths for cosine similarity
+        rows = np.repeat(np.arange(len(user_ids)), lengths)
+        self.norms = np.sqrt(np.bincount(
+            rows, weights=self.weights ** 2, minlength=len(user_ids)))
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def batches(self, jobs, batch_size):
+        """
+        (start, end) runs of students whose terms reach at most batch_size
+        jobs together, a single student can go over on its own
+        """
+        pairs = np.diff(jobs.posting_ptr)[self.indices]
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        per_student = np.bincount(rows, weights=pairs, minlength=len(self))
+
+        start, total = 0, 0
+        for row, count in enumerate(per_student):
+            if total and total + count > batch_size:
+                yield start, row
+                start, total = row, 0
+            total += count
+        if start < len(self):
+            yield start, len(self)
+
+
+def load_students(user_ids=None):
+    from .models import StudentProfile
+
+    profiles = StudentProfile.objects.values_list(
+        'user_profile__user_id', 'skills', 'course', 'year_level')
+    if user_ids is not None:
+        profiles = profiles.filter(user_profile__user_id__in=user_ids)
+    return Students(profiles.iterator())
+
+
+def active_jobs():
+    from .models import Job
+
+    return list(Job.objects.filter(status='active').only(*JOB_FIELDS))
+
+
+class Jobs:
+    """
+    active jobs as sparse unit length rows over the students' terms, kept
+    by term so a student is only scored against jobs sharing a term
+    """
+
+    def __init__(self, jobs, vocabulary):
+        self.ids = np.array([job.id for job in jobs], dtype=np.int64)
+        self.internship = np.array([job.work_type == 'internship' for job in jobs],
+                                   dtype=bool)
+        lengths, indices, weights = [], [], []
+        for job in jobs:
+            terms = job_terms(job, vocabulary)
+            lengths.append(len(terms))
+            indices.extend(terms)
+            weights.extend(terms.values())
+
+        indices = np.array(indices, dtype=np.int64)
+        weights = np.array(weights, dtype=np.float32)
+        rows = np.repeat(np.arange(len(jobs)), lengths)
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(jobs)))
+        weights /= np.maximum(norms[rows], 1e-9)
+
+        order = np.argsort(indices, kind='stable')
+        self.posting_rows = rows[order]
+        self.posting_weights = weights[order]
+        self.posting_ptr = np.concatenate(([0], np.cumsum(np.bincount(
+            indices, minlength=len(vocabulary)))))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def work_type_factor(graduated, internship):
+    """multiplier per (student, job) pair for internships"""
+    return np.where(
+        internship,
+        np.where(graduated, GRADUATE_INTERNSHIP, INTERNSHIP_BOOST),
+        1.0,
+    )
+
+
+def score_batch(students, start, end, jobs):
+    """
+    (student rows, job rows, scores) of students start..end against every
+    job sharing a term with them, pairs scoring 0 are never built
+    """
+    first, last = students.indptr[start], students.indptr[end]
+    owners = np.repeat(np.arange(start, end), np.diff(students.indptr[start:end + 1]))
+    positions, lengths = gather(jobs.posting_ptr, students.indices[first:last])
+
+    # one entry per (student term, job with that term), summed per pair
+    keys = np.repeat(owners, lengths) * len(jobs) + jobs.posting_rows[positions]
+    products = (jobs.posting_weights[positions]
+                * np.repeat(students.weights[first:last], lengths))
+    keys, inverse = np.unique(keys, return_inverse=True)
+    # float even when nothing matched, bincount of nothing gives ints
+    scores = np.bincount(inverse, weights=products).astype(np.float64)
+
+    student_rows, job_rows = np.divmod(keys, len(jobs))
+    scores /= np.maximum(students.norms[student_rows], 1e-9)
+    scores *= work_type_factor(students.graduated[student_rows],
+                               jobs.internship[job_rows])
+    return student_rows, job_rows, scores
+
+
+def top_jobs(student_rows, job_rows, scores, limit):
+    """best limit (student row, job row, score) per student, zero scores dropped"""
+    order = np.lexsort((-scores, student_rows))
+    student_rows, job_rows, scores = student_rows[order], job_rows[order], scores[order]
+
+    # position of each pair within its student's run
+    starts = np.searchsorted(student_rows, student_rows, side='left')
+    keep = (np.arange(len(student_rows)) - starts < limit) & (scores > 0)
+    return zip(student_rows[keep], job_rows[keep], scores[keep])
+
+
+def recommend(students, jobs, limit=TOP_JOBS, batch_size=BATCH_SIZE):
+    """yield Recommendation objects for every student, batch by batch"""
+    from .models import Recommendation
+
+    if not len(students) or not jobs:
+        return
+
+    jobs = Jobs(jobs, students.vocabulary)
+    for start, end in students.batches(jobs, batch_size):
+        for student_row, job_row, score in top_jobs(
+                *score_batch(students, start, end, jobs), limit):
+            yield Recommendation(
+                user_id=int(students.user_ids[student_row]),
+                job_id=int(jobs.ids[job_row]), score=float(score))
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """recompute every student's list, returns how many were stored"""
+    from .models import Recommendation
+
+    students = load_students()
+    # score before the transaction, it holds the write lock from BEGIN
+    recommendations = list(recommend(students, active_jobs(), batch_size=batch_size))
+
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        created = Recommendation.objects.bulk_create(
+            recommendations, batch_size=1000)
+    return len(created)
+
+
+def update_student(user_id):
+    """recompute one student's list, after they edit their profile"""
+    from .models import Recommendation
+
+    students = load_students([user_id])
+    recommendations = list(recommend(students, active_jobs()))
+
+    with transaction.atomic():
+        Recommendation.objects.filter(user_id=user_id).delete()
+        Recommendation.objects.bulk_create(recommendations)
+
+
+def update_job(job):
+    """
+    score one new or edited job against every student and add it to the
+    best matches, the next batch run trims lists back to TOP_JOBS
+    """
+    from .models import Recommendation
+
+    if job.status != 'active':
+        Recommendation.objects.filter(job=job).delete()
+        return
+
+    students = load_students()
+    if not len(students):
+        return
+
+    # one sparse matrix times vector product for every student at once
+    weights = np.zeros(len(students.vocabulary), dtype=np.float32)
+    terms = job_terms(job, students.vocabulary)
+    weights[list(terms)] = list(terms.values())
+    norm = np.linalg.norm(weights)
+    rows = np.repeat(np.arange(len(students)), np.diff(students.indptr))
+    scores = np.bincount(rows, weights=students.weights * weights[students.indices],
+                         minlength=len(students))
+    scores /= np.maximum(students.norms * norm, 1e-9)
+    scores *= work_type_factor(students.graduated, job.work_type == 'internship')
+
+    limit = min(NEW_JOB_STUDENTS, len(students))
+    best = np.argpartition(-scores, limit - 1)[:limit]
+    best = best[scores[best] > 0]
+
+    with transaction.atomic():
+        Recommendation.objects.filter(job=job).delete()
+        Recommendation.objects.bulk_create(
+            Recommendation(user_id=int(students.user_ids[row]), job_id=job.id,
+                           score=float(scores[row]))
+            for row in best
+        )
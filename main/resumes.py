@@ -0,0 +1,217 @@
+import hashlib
+import mimetypes
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import (content_disposition_header, http_date,
+                               parse_etags, quote_etag)
+
+RESUME_DIR = 'resumes'
+BLOCK_SIZE = 64 * 1024  # bytes streamed per chunk
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    hash every uploaded file while its chunks stream in and pass them on
+    untouched, so the next handler still writes the file and storing it
+    by content doesn't read it a second time. digests end up on
+    request.upload_digests by field name
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.request is not None:
+            if not hasattr(self.request, 'upload_digests'):
+                self.request.upload_digests = {}
+            self.request.upload_digests[self.field_name] = self.hasher.hexdigest()
+        # let the next handler return the file
+        return None
+
+
+def file_digest(file):
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def upload_digest(request, field_name):
+    """digest taken during the upload, None when the handler didn't run"""
+    return getattr(request, 'upload_digests', {}).get(field_name)
+
+
+def resume_name(digest, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{RESUME_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+def store(file, digest=None):
+    """
+    save a resume under its content hash and return the storage name,
+    the same file uploaded again is not written twice
+    """
+    if digest is None:
+        digest = file_digest(file)
+    name = resume_name(digest, file.name)
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, file)
+
+
+def stored_names(path=RESUME_DIR):
+    """every file under path in the default storage"""
+    if not default_storage.exists(path):
+        return
+    directories, files = default_storage.listdir(path)
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in directories:
+        yield from stored_names(f'{path}/{directory}')
+
+
+def referenced_names():
+    from .models import Application, StudentProfile
+
+    names = set(Application.objects.exclude(resume='').exclude(
+        resume__isnull=True).values_list('resume', flat=True).distinct())
+    names.update(StudentProfile.objects.exclude(resume='').exclude(
+        resume__isnull=True).values_list('resume', flat=True).distinct())
+    return names
+
+
+def collect_garbage(grace=timedelta(hours=24), dry_run=False):
+    """
+    delete stored resumes no application or profile points to, returns
+    their names. files newer than grace are kept, an upload is stored a
+    moment before its application is saved
+    """
+    referenced = referenced_names()
+    cutoff = timezone.now() - grace
+
+    removed = []
+    for name in stored_names():
+        if name in referenced or default_storage.get_modified_time(name) > cutoff:
+            continue
+        if not dry_run:
+            default_storage.delete(name)
+        removed.append(name)
+    return removed
+
+
+class RangeFile:
+    """read at most length bytes of a file from start"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, end included. None to send
+    the whole file (no header, or several ranges), False when unsatisfiable
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # suffix range, the last n bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def serve(request, name, filename):
+    """
+    download a stored resume: conditional requests by etag, single byte
+    ranges, streamed in chunks or handed off to the front-end server
+    """
+    size = default_storage.size(name)
+    modified = default_storage.get_modified_time(name)
+    etag = quote_etag(hashlib.sha1(
+        f'{name}:{size}:{modified.timestamp()}'.encode()).hexdigest())
+    last_modified = int(modified.timestamp())
+
+    # If-None-Match / If-Modified-Since
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    # settings.RESUME_SENDFILE_HEADER hands the file to the front-end
+    # server, which then does the ranges and streaming itself
+    sendfile = getattr(settings, 'RESUME_SENDFILE_HEADER', None)
+    if sendfile:
+        content_type = mimetypes.guess_type(filename)[0]
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        if sendfile.lower() == 'x-accel-redirect':
+            # an internal nginx location mapped to MEDIA_ROOT
+            prefix = getattr(settings, 'RESUME_SENDFILE_PREFIX', '/protected/')
+            response[sendfile] = prefix + name
+        else:
+            response[sendfile] = default_storage.path(name)
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    else:
+        byte_range = None
+        # an outdated If-Range gets the whole new file
+        if_range = request.headers.get('If-Range')
+        if if_range is None or etag in parse_etags(if_range):
+            byte_range = parse_range(request.headers.get('Range'), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        file = default_storage.open(name, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, as_attachment=True, filename=filename)
+            response['Content-Length'] = size
+        else:
+            start, end = byte_range
+            response = FileResponse(
+                RangeFile(file, start, end - start + 1), status=206,
+                as_attachment=True, filename=filename)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        response.block_size = BLOCK_SIZE
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,89 @@
+import itertools
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+
+PIN_COOKIE = 'db_primary'  # set after a write, see PrimaryPinMiddleware
+
+# set while a view marked @read_replica runs
+reading_replica = ContextVar('reading_replica', default=False)
+
+_cycles = {}
+
+
+def replica_weights():
+    """alias -> weight, from settings.DATABASE_REPLICAS"""
+    return getattr(settings, 'DATABASE_REPLICAS', {})
+
+
+def next_replica():
+    """weighted round robin, {'a': 1, 'b': 2} gives a, b, b, a, b, b..."""
+    weights = replica_weights()
+    if not weights:
+        return None
+
+    key = tuple(sorted(weights.items()))
+    if key not in _cycles:
+        _cycles[key] = itertools.cycle(
+            [alias for alias, weight in key for _ in range(weight)])
+    return next(_cycles[key])
+
+
+def is_pinned(request):
+    """the user wrote something a moment ago, read it back from the primary"""
+    return PIN_COOKIE in request.COOKIES
+
+
+def after_replica_lag(name, *args):
+    """
+    queue a task for when replicas have caught up, to expire caches a
+    second time: a request reading a lagging replica may have cached the
+    old rows under the new version
+    """
+    from .taskqueue import enqueue
+
+    if replica_weights():
+        run_at = timezone.now() + timedelta(seconds=settings.REPLICA_PIN_SECONDS)
+        enqueue(name, args, run_at=run_at)
+
+
+def read_replica(view):
+    """run a read only view against a replica, unless the user is pinned"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_pinned(request) or not replica_weights():
+            return view(request, *args, **kwargs)
+
+        token = reading_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            reading_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    reads of the job portal tables go to a replica inside @read_replica
+    views. auth and sessions always use the primary, a replica a few
+    seconds behind would log people out
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'main' and reading_replica.get():
+            return next_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are copies of the primary, never migrated directly
+        return db == 'default'
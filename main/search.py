@@ -0,0 +1,200 @@
+import html
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+# fts5 virtual table, rowid is the job id
+FTS_TABLE = 'main_job_fts'
+FTS_COLUMNS = ('title', 'company_name', 'summary', 'description')
+
+# bm25 weight per column, title and company count more than the description
+RANK_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+# snippet markers, swapped for <mark> after the text is escaped
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+
+def is_enabled():
+    """fts5 index only exists on sqlite"""
+    return connection.vendor == 'sqlite'
+
+
+def html_to_text(value):
+    """strip tinymce markup so only words are indexed"""
+    if not value:
+        return ''
+    text = html.unescape(strip_tags(value))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def build_match_query(text):
+    """
+    turn free text into a safe fts5 query, every word is quoted and
+    prefix matched so partial words still find results (pyth -> python)
+    """
+    terms = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def filter_jobs(queryset, text):
+    """filter a job queryset by a search box query"""
+    if not is_enabled():
+        return queryset.filter(
+            Q(title__icontains=text) |
+            Q(employer__userprofile__employerprofile__company_name__icontains=text) |
+            Q(job_description__icontains=text) |
+            Q(summary__icontains=text)
+        )
+
+    match = build_match_query(text)
+    if not match:
+        return queryset.none()
+
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+
+
+def rank_jobs(queryset, text):
+    """
+    filter a job queryset by a search box query and order it by bm25
+    relevance, each job gets a search_rank. see attach_snippets for the
+    highlighted text of a page
+    """
+    if not is_enabled():
+        return filter_jobs(queryset, text)
+
+    match = build_match_query(text)
+    if not match:
+        return queryset.none()
+
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    table = queryset.model._meta.db_table
+
+    # join the index once, bm25 only works in the query doing the MATCH.
+    # the unary + keeps sqlite from handing the job id to the index, which
+    # runs the whole MATCH again for every job, so the MATCH drives the
+    # join and each match is one primary key lookup
+    return queryset.extra(
+        select={'search_rank': f'bm25({FTS_TABLE}, {weights})'},
+        tables=[FTS_TABLE],
+        where=[
+            f'"{table}"."id" = +{FTS_TABLE}.rowid',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[match],
+    ).order_by('search_rank', '-created_at')
+
+
+def attach_snippets(jobs, text):
+    """
+    set job.search_snippet on a page of ranked jobs. cut in one query for
+    just these rows, not for every match while sorting
+    """
+    jobs = list(jobs)
+    match = build_match_query(text)
+    if not jobs or not match or not is_enabled():
+        return
+
+    description = FTS_COLUMNS.index('description')
+    ids = [job.id for job in jobs]
+    # the database the page was read from, a replica for public pages
+    with connections[jobs[0]._state.db].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, snippet({FTS_TABLE}, {description}, %s, %s, '...', 16) "
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid IN ({", ".join(["%s"] * len(ids))})',
+            [SNIPPET_START, SNIPPET_END, match, *ids])
+        snippets = dict(cursor.fetchall())
+
+    for job in jobs:
+        job.search_snippet = snippets.get(job.id, '')
+
+
+def get_company_name(employer_id):
+    from .models import EmployerProfile
+
+    return EmployerProfile.objects.filter(
+        user_profile__user_id=employer_id
+    ).values_list('company_name', flat=True).first() or ''
+
+
+def job_row(job, company_name):
+    return (
+        job.id,
+        job.title,
+        company_name,
+        job.summary or '',
+        html_to_text(job.job_description),
+    )
+
+
+def index_job(job, company_name=None):
+    if not is_enabled():
+        return
+    if company_name is None:
+        company_name = get_company_name(job.employer_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [job.id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) '
+            'VALUES (%s, %s, %s, %s, %s)', job_row(job, company_name))
+
+
+def unindex_job(job_id):
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [job_id])
+
+
+def reindex_company(user_profile_id, company_name):
+    """company name is copied into every job row, keep them in sync"""
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET company_name = %s WHERE rowid IN '
+            '(SELECT j.id FROM main_job j '
+            'INNER JOIN main_userprofile p ON p.user_id = j.employer_id '
+            'WHERE p.id = %s)',
+            [company_name, user_profile_id])
+
+
+def rebuild(batch_size=500):
+    """drop every indexed row and index all jobs again, returns job count"""
+    from .models import EmployerProfile, Job
+
+    if not is_enabled():
+        return 0
+
+    companies = dict(EmployerProfile.objects.values_list(
+        'user_profile__user_id', 'company_name'))
+    jobs = Job.objects.only(
+        'id', 'employer_id', 'title', 'summary', 'job_description'
+    ).order_by('id')
+
+    count = 0
+    batch = []
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        insert_sql = (
+            f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) '
+            'VALUES (%s, %s, %s, %s, %s)')
+
+        for job in jobs.iterator(chunk_size=batch_size):
+            batch.append(job_row(job, companies.get(job.employer_id, '')))
+            if len(batch) >= batch_size:
+                cursor.executemany(insert_sql, batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            cursor.executemany(insert_sql, batch)
+            count += len(batch)
+
+    return count
@@ -0,0 +1,240 @@
+import random
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import caching, counters, recommendations, resumes, search, similar
+from .models import (Application, EmployerProfile, Job, Saved, StudentProfile,
+                     UserProfile)
+
+BATCH_SIZE = 500
+PASSWORD = 'password'  # every seeded user, for logging in to look around
+DAYS = 60  # jobs, applications and saves spread over this many days
+
+COMPANIES = [
+    'Acme', 'Bayanihan Tech', 'Pinoy Pixels', 'Luzon Logistics', 'Mabuhay Foods',
+    'Island Cloud', 'Kalye Design', 'Sampaguita Health', 'Bulacan Builders',
+    'Tala Analytics', 'Habi Textiles', 'Lakbay Travel',
+]
+INDUSTRIES = ['IT', 'Logistics', 'Food', 'Health', 'Construction', 'Retail', 'Design']
+LOCATIONS = [
+    'Malolos, Bulacan', 'Meycauayan, Bulacan', 'Quezon City, Metro Manila',
+    'Makati, Metro Manila', 'Pasig, Metro Manila', 'Cebu City, Cebu',
+    'Davao City, Davao del Sur', 'Angeles, Pampanga', 'Baguio, Benguet',
+]
+ROLES = [
+    ('Python Developer', ['Python', 'Django', 'SQL', 'Git']),
+    ('Frontend Developer', ['JavaScript', 'React', 'HTML', 'CSS']),
+    ('Data Analyst', ['SQL', 'Excel', 'Python', 'Power BI']),
+    ('QA Tester', ['Testing', 'Selenium', 'Attention to detail']),
+    ('IT Support Specialist', ['Networking', 'Windows', 'Troubleshooting']),
+    ('Graphic Designer', ['Photoshop', 'Illustrator', 'Figma']),
+    ('Marketing Assistant', ['Social media', 'Copywriting', 'Canva']),
+    ('Accounting Clerk', ['Excel', 'Bookkeeping', 'QuickBooks']),
+    ('Customer Service Representative', ['Communication', 'English', 'CRM']),
+    ('Mobile Developer', ['Kotlin', 'Flutter', 'Java', 'Git']),
+]
+LEVELS = ['', 'Junior ', 'Senior ', 'Intern ', 'Associate ']
+SCHOOLS = ['Bulacan State University', 'University of the Philippines',
+           'Polytechnic University of the Philippines', 'De La Salle University']
+COURSES = ['BS Information Technology', 'BS Computer Science',
+           'BS Accountancy', 'BS Multimedia Arts', 'BS Business Administration']
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Angel', 'Paolo', 'Bea',
+               'Carlo', 'Nicole', 'Miguel', 'Patricia']
+LAST_NAMES = ['Cruz', 'Santos', 'Reyes', 'Garcia', 'Mendoza', 'Bautista',
+              'Ramos', 'Dela Cruz', 'Aquino', 'Villanueva']
+# smallest valid pdf, shared by every seeded application like a resume
+# uploaded many times is stored once
+RESUME = (b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+          b'2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\n'
+          b'trailer<</Root 1 0 R>>\n%%EOF\n')
+PAY = {
+    'hourly': (80, 250),
+    'monthly': (15000, 60000),
+    'annual': (180000, 900000),
+    'annual-plus': (180000, 700000),
+}
+
+
+def job_description(rng, title, skills, company):
+    """html like tinymce saves it"""
+    duties = ''.join(
+        f'<li>{duty}</li>' for duty in rng.sample([
+            f'Work with the team on day to day {title.lower()} tasks',
+            'Document your work and share it in weekly reviews',
+            f'Use {skills[0]} to deliver features on schedule',
+            'Coordinate with clients and other departments',
+            'Keep tools, reports and records up to date',
+            'Take part in trainings and code or design reviews',
+        ], 4))
+    wanted = ''.join(f'<li><strong>{skill}</strong></li>' for skill in skills)
+    return (
+        f'<p><strong>{company}</strong> is looking for a <em>{title}</em> '
+        'to join our growing team.</p>'
+        f'<h3>Responsibilities</h3><ul>{duties}</ul>'
+        f'<h3>Qualifications</h3><ul>{wanted}</ul>'
+        '<p>Fresh graduates and students are welcome to apply.&nbsp;'
+        'We offer training, flexible hours and a friendly team.</p>'
+    )
+
+
+def spread(rng, now, count):
+    """created times over the last DAYS days, newest last"""
+    return sorted(now - timedelta(seconds=rng.randint(0, DAYS * 86400))
+                  for _ in range(count))
+
+
+def create_users(role, count, start, password, batch_size):
+    users = User.objects.bulk_create([
+        User(username=f'{role}{start + i}@example.com',
+             email=f'{role}{start + i}@example.com', password=password)
+        for i in range(count)
+    ], batch_size=batch_size)
+    profiles = UserProfile.objects.bulk_create(
+        [UserProfile(user=user, role=role) for user in users],
+        batch_size=batch_size)
+    return users, profiles
+
+
+def pairs(rng, owners, targets, count):
+    """count unique (owner, target) pairs, a few owners get many"""
+    if not owners or not targets:
+        return []
+    per_owner = Counter(rng.choices(owners, k=count))
+    return [(owner, target) for owner, wanted in per_owner.items()
+            for target in rng.sample(targets, min(wanted, len(targets)))]
+
+
+def seed(employers=20, students=200, jobs=500, applications=2000, saves=1000,
+         batch_size=BATCH_SIZE, seed=None):
+    """
+    add a realistic dataset with bulk_create, then rebuild what signals
+    would have kept up to date. returns the number of rows per model
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(PASSWORD)
+    start = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+
+    with transaction.atomic():
+        employer_users, employer_profiles = create_users(
+            'employer', employers, start, password, batch_size)
+        companies = {user.id: f'{rng.choice(COMPANIES)} {i + 1}'
+                     for i, user in enumerate(employer_users)}
+        EmployerProfile.objects.bulk_create([
+            EmployerProfile(
+                user_profile=profile,
+                company_name=companies[profile.user_id],
+                phone='+63 912 345 6789',
+                company_address=rng.choice(LOCATIONS),
+                industry=rng.choice(INDUSTRIES),
+                company_size=rng.choice(['1-10', '11-50', '51-200', '201-500', '500+']),
+                description='A Philippine company hiring students and fresh graduates.')
+            for profile in employer_profiles
+        ], batch_size=batch_size)
+
+        student_users, student_profiles = create_users(
+            'student', students, start + employers, password, batch_size)
+        StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user_profile=profile,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                phone='+63 912 345 6789',
+                school=rng.choice(SCHOOLS),
+                course=rng.choice(COURSES),
+                year_level=rng.choice(['1', '2', '3', '4', 'graduate']),
+                skills=', '.join(rng.sample(rng.choice(ROLES)[1], 2) + ['Communication']))
+            for profile in student_profiles
+        ], batch_size=batch_size)
+
+        job_rows = []
+        for created_at in spread(rng, now, jobs):
+            employer = rng.choice(employer_users)
+            role, skills = rng.choice(ROLES)
+            title = rng.choice(LEVELS) + role
+            pay_type = rng.choice(list(PAY))
+            low, high = PAY[pay_type]
+            pay_min = rng.randint(low, high)
+            job = Job(
+                employer=employer, title=title,
+                status='active' if rng.random() < 0.85 else 'closed',
+                location=rng.choice(LOCATIONS),
+                workplace=rng.choice(['onsite', 'hybrid', 'remote']),
+                work_type=rng.choice(['internship', 'full', 'part', 'contract', 'casual']),
+                pay_type=pay_type, pay_min=Decimal(pay_min),
+                pay_max=Decimal(rng.randint(pay_min, high)),
+                job_description=job_description(
+                    rng, title, skills, companies[employer.id]),
+                summary=f'{title} role, {", ".join(skills[:2])} preferred.')
+            # bulk_create skips save(), which fills these
+            job.normalize_pay()
+            job.created_at = created_at
+            job_rows.append(job)
+        job_rows = Job.objects.bulk_create(job_rows, batch_size=batch_size)
+        # created_at is auto_now_add, put the spread back in one pass per batch
+        Job.objects.bulk_update(job_rows, ['created_at'], batch_size=batch_size)
+
+        resume = resumes.store(ContentFile(RESUME, name='resume.pdf'))
+        open_jobs = [job for job in job_rows if job.status == 'active'] or job_rows
+        application_rows = [
+            Application(job=job, applicant=student, resume=resume,
+                        status=rng.choices(['pending', 'accepted', 'rejected'],
+                                           weights=[70, 15, 15])[0])
+            for student, job in pairs(rng, student_users, job_rows, applications)
+        ]
+        application_rows = Application.objects.bulk_create(
+            application_rows, batch_size=batch_size)
+        for application, applied_at in zip(application_rows, spread(
+                rng, now, len(application_rows))):
+            application.applied_at = max(applied_at, application.job.created_at)
+        Application.objects.bulk_update(
+            application_rows, ['applied_at'], batch_size=batch_size)
+
+        saved_rows = Saved.objects.bulk_create([
+            Saved(user=student, job=job)
+            for student, job in pairs(rng, student_users, open_jobs, saves)
+        ], batch_size=batch_size)
+
+    refresh_derived()
+    return {
+        'employers': len(employer_users),
+        'students': len(student_users),
+        'jobs': len(job_rows),
+        'applications': len(application_rows),
+        'saves': len(saved_rows),
+    }
+
+
+def refresh_derived():
+    """counters, indexes and caches normally kept up to date by signals"""
+    counters.reconcile()
+    search.rebuild()
+    caching.bump_version('jobs')
+    caching.bump_version('student_skills')
+    recommendations.rebuild()
+    similar.rebuild()
+
+
+def sample_data():
+    """
+    an employer, one of their jobs with applications, one application
+    and its student, for requesting pages that need ids
+    """
+    application = (Application.objects.select_related('job', 'applicant')
+                   .order_by('-job__application_count', 'id').first())
+    if application is None:
+        return None
+    return {
+        'employer': application.job.employer,
+        'student': application.applicant,
+        'job': application.job,
+        'application': application,
+    }
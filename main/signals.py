@@ -0,0 +1,129 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import (autocomplete, caching, counters, fragments, identity, ranking,
+               routers, search, tasks)
+from .models import (Application, EmployerProfile, Job, StudentProfile,
+                     UserProfile)
+
+
+# keep the search index and suggestions in sync with jobs and company names
+@receiver(post_save, sender=Job)
+def index_job(sender, instance, raw=False, **kwargs):
+    if not raw:
+        company_name = search.get_company_name(instance.employer_id)
+        search.index_job(instance, company_name)
+        autocomplete.suggestions.update_job(instance, company_name)
+
+
+@receiver(post_delete, sender=Job)
+def unindex_job(sender, instance, **kwargs):
+    search.unindex_job(instance.id)
+    autocomplete.suggestions.delete_job(instance.id)
+
+
+# drop cached job list facet counts when jobs or company names change
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+@receiver(post_save, sender=EmployerProfile)
+@receiver(post_delete, sender=EmployerProfile)
+def expire_job_counts(sender, **kwargs):
+    caching.bump_version('jobs')
+    routers.after_replica_lag('main.caching.bump_version', 'jobs')
+
+
+@receiver(post_save, sender=EmployerProfile)
+def reindex_company(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.reindex_company(instance.user_profile_id, instance.company_name)
+        autocomplete.suggestions.rename_company(
+            instance.user_profile.user_id, instance.company_name)
+
+
+@receiver(post_delete, sender=EmployerProfile)
+def clear_company(sender, instance, **kwargs):
+    search.reindex_company(instance.user_profile_id, '')
+    autocomplete.suggestions.rename_company(instance.user_profile.user_id, '')
+
+
+# drop rendered job cards and panels when the job or its company changes
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def expire_job_fragments(sender, instance, **kwargs):
+    fragments.expire_jobs([instance.id])
+
+
+@receiver(post_save, sender=EmployerProfile)
+@receiver(post_delete, sender=EmployerProfile)
+def expire_company_fragments(sender, instance, **kwargs):
+    fragments.expire_jobs(Job.objects.filter(
+        employer__userprofile__id=instance.user_profile_id
+    ).values_list('id', flat=True))
+
+
+# sessions keep the role and avatar, rebuild them when either changes
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def expire_identity(sender, instance, **kwargs):
+    identity.expire(instance.id)
+
+
+# a password change logs out the other sessions, drop their identity so
+# they load the user again. saving only last_login at login keeps them
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def expire_identity_sessions(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'password' in update_fields:
+        identity.expire_user(instance.pk)
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=EmployerProfile)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=EmployerProfile)
+def expire_identity_avatar(sender, instance, **kwargs):
+    identity.expire(instance.user_profile_id)
+
+
+# keep the application counters on Job in step with applications
+@receiver(post_save, sender=Application)
+def count_application(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.application_added(instance.job_id, instance.status)
+    else:
+        old_status = getattr(instance, 'loaded_status', instance.status)
+        counters.status_changed(instance.job_id, old_status, instance.status)
+    instance.loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Application)
+def uncount_application(sender, instance, origin=None, **kwargs):
+    # the job row is going away with its applications, nothing to count
+    if isinstance(origin, Job) and origin.id == instance.job_id:
+        return
+    counters.application_removed(instance.job_id, instance.status)
+
+
+# refresh the student's skill vector used to rank applicants
+@receiver(post_save, sender=StudentProfile)
+def update_student_skills(sender, instance, raw=False, **kwargs):
+    if not raw:
+        version = caching.bump_version('student_skills')
+        ranking.skills.update_student(
+            instance.user_profile.user_id, instance.skills, version)
+
+
+# recommendations and similar jobs are recomputed by the task worker
+@receiver(post_save, sender=Job)
+def queue_job_refresh(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.refresh_job.delay(instance.id)
+
+
+@receiver(post_save, sender=StudentProfile)
+def queue_student_refresh(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.refresh_student.delay(instance.user_profile.user_id)
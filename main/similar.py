@@ -0,0 +1,238 @@
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .search import html_to_text
+
+NEIGHBORS = 6  # similar jobs kept and shown per job
+CANDIDATES = 50  # closest jobs that may take in a new or edited job
+TITLE_WEIGHT = 2  # a title word counts as much as two description words
+MAX_DF = 0.5  # words in more than half the jobs don't tell them apart
+MAX_WORD = 100  # longer "words" are urls or junk, and wouldn't fit a JobTerm
+
+JOB_FIELDS = ('id', 'title', 'job_description', 'location', 'work_type')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'of', 'on', 'or', 'our', 'the', 'to', 'we', 'will', 'with', 'you',
+    'your',
+}
+
+
+def words(text):
+    found = re.findall(r'[\w+#]+', (text or '').casefold())
+    return [word for word in found
+            if 1 < len(word) <= MAX_WORD and word not in STOPWORDS]
+
+
+def job_terms(title, description, location, work_type):
+    """term counts of a job, location and work type kept apart from text"""
+    terms = Counter(words(html_to_text(description)))
+    for word in words(title):
+        terms[word] += TITLE_WEIGHT
+    for word in words(location):
+        terms[f'location:{word}'] += 1
+    terms[f'work_type:{work_type}'] += 1
+    return terms
+
+
+def gather(indptr, rows):
+    """positions of every entry in rows of a CSR style array"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, lengths
+
+
+class Vectors:
+    """
+    tf-idf vectors of many jobs, unit length, kept both by job (to read
+    one job's terms) and by term (to score a job against every other one
+    without comparing all pairs)
+    """
+
+    def __init__(self, rows):
+        vocabulary = {}
+        ids, lengths, columns, counts = [], [], [], []
+        for job_id, terms in rows:
+            ids.append(job_id)
+            lengths.append(len(terms))
+            for term, count in terms.items():
+                columns.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+
+        lengths = np.array(lengths, dtype=np.int64)
+        self.terms = list(vocabulary)  # column -> term
+        self.ids = np.array(ids, dtype=np.int64)
+        self.positions = {job_id: row for row, job_id in enumerate(ids)}
+        self.indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.indices = np.array(columns, dtype=np.int64)
+
+        # log scaled term frequency times smoothed idf
+        df = np.bincount(self.indices, minlength=len(vocabulary))
+        idf = np.log((1 + len(ids)) / (1 + df)) + 1
+        self.weights = (1 + np.log(np.array(counts, dtype=np.float64))) * idf[self.indices]
+
+        rows = np.repeat(np.arange(len(ids)), lengths)
+        norms = np.sqrt(np.bincount(
+            rows, weights=self.weights ** 2, minlength=len(ids)))
+        self.weights /= np.maximum(norms[rows], 1e-9)
+
+        # postings per term, leaving out terms that can't tell jobs apart:
+        # one job only (nothing to match) or most of them
+        useful = (df >= 2) & (df <= max(2, MAX_DF * len(ids)))
+        keep = useful[self.indices]
+        order = np.argsort(self.indices[keep], kind='stable')
+        self.posting_rows = rows[keep][order]
+        self.posting_weights = self.weights[keep][order]
+        self.posting_ptr = np.concatenate(([0], np.cumsum(np.bincount(
+            self.indices[keep], minlength=len(vocabulary)))))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, row):
+        """cosine similarity of one job against every job, itself zeroed"""
+        first, last = self.indptr[row], self.indptr[row + 1]
+        columns, weights = self.indices[first:last], self.weights[first:last]
+
+        positions, lengths = gather(self.posting_ptr, columns)
+        scores = np.bincount(
+            self.posting_rows[positions],
+            weights=self.posting_weights[positions] * np.repeat(weights, lengths),
+            minlength=len(self))
+        scores[row] = 0
+        return scores
+
+
+def load_vectors():
+    from .models import Job
+
+    jobs = Job.objects.filter(status='active').values_list(*JOB_FIELDS)
+    return Vectors((job_id, job_terms(*fields)) for job_id, *fields in jobs.iterator())
+
+
+def closest(scores, limit):
+    """rows with the highest scores, best first, zero scores dropped"""
+    limit = min(limit, len(scores))
+    if limit == 0:
+        return np.zeros(0, dtype=np.int64)
+    best = np.argpartition(-scores, limit - 1)[:limit]
+    best = best[np.argsort(-scores[best])]
+    return best[scores[best] > 0]
+
+
+def neighbors(vectors, row, scores):
+    from .models import SimilarJob
+
+    job_id = int(vectors.ids[row])
+    return [
+        SimilarJob(job_id=job_id, similar_id=int(vectors.ids[other]),
+                   score=float(scores[other]))
+        for other in closest(scores, NEIGHBORS)
+    ]
+
+
+def term_weights(terms, df, total):
+    """unit length tf-idf weights of one job, same formula as Vectors"""
+    weights = {
+        term: (1 + np.log(count)) * (np.log((1 + total) / (1 + df[term])) + 1)
+        for term, count in terms.items()
+    }
+    norm = np.sqrt(sum(weight ** 2 for weight in weights.values()))
+    return {term: weight / max(norm, 1e-9) for term, weight in weights.items()}
+
+
+def stored_terms(vectors):
+    """JobTerm rows of every job in vectors"""
+    from .models import JobTerm
+
+    for row, job_id in enumerate(vectors.ids):
+        for position in range(vectors.indptr[row], vectors.indptr[row + 1]):
+            yield JobTerm(job_id=int(job_id), term=vectors.terms[vectors.indices[position]],
+                          weight=float(vectors.weights[position]))
+
+
+def rebuild():
+    """recompute the neighbors of every active job, returns how many were stored"""
+    from .models import JobTerm, SimilarJob
+
+    vectors = load_vectors()
+    # score before the transaction, it holds the write lock from BEGIN
+    rows = [similar for row in range(len(vectors))
+            for similar in neighbors(vectors, row, vectors.scores(row))]
+    terms = list(stored_terms(vectors))
+
+    with transaction.atomic():
+        SimilarJob.objects.all().delete()
+        SimilarJob.objects.bulk_create(rows, batch_size=1000)
+        JobTerm.objects.all().delete()
+        JobTerm.objects.bulk_create(terms, batch_size=1000)
+    return len(rows)
+
+
+def update_job(job):
+    """
+    recompute the neighbors of a new or edited job from the stored terms
+    of the others, and put it in the lists of the closest jobs where it
+    beats their weakest neighbor. only this job's text is read. idf
+    weights drift a little as jobs are added, the batch run resets them
+    """
+    from .models import Job, JobTerm, SimilarJob
+
+    if job.status != 'active':
+        with transaction.atomic():
+            SimilarJob.objects.filter(Q(job=job) | Q(similar=job)).delete()
+            JobTerm.objects.filter(job=job).delete()
+        return
+
+    terms = job_terms(job.title, job.job_description, job.location, job.work_type)
+    total = Job.objects.filter(status='active').count()
+    others = JobTerm.objects.filter(term__in=list(terms)).exclude(job=job)
+    found = dict(others.values('term').annotate(jobs=Count('id')).values_list('term', 'jobs'))
+    df = {term: found.get(term, 0) + 1 for term in terms}
+    weights = term_weights(terms, df, total)
+
+    # same postings Vectors keeps: terms shared by some but not most jobs
+    useful = [term for term in terms if 2 <= df[term] <= max(2, MAX_DF * total)]
+    totals = defaultdict(float)
+    for job_id, term, weight in others.filter(term__in=useful).values_list(
+            'job_id', 'term', 'weight').iterator():
+        totals[job_id] += weights[term] * weight
+
+    ids = np.fromiter(totals, dtype=np.int64, count=len(totals))
+    scores = np.fromiter(totals.values(), dtype=np.float64, count=len(totals))
+    created = [
+        SimilarJob(job_id=job.id, similar_id=int(ids[other]), score=float(scores[other]))
+        for other in closest(scores, NEIGHBORS)
+    ]
+
+    # similarity is symmetric, so a close job scores this one the same
+    candidates = {int(ids[other]): float(scores[other])
+                  for other in closest(scores, CANDIDATES)}
+    current = {}
+    for job_id, similar_id, score in SimilarJob.objects.filter(
+            job_id__in=candidates).exclude(similar=job).values_list(
+            'job_id', 'similar_id', 'score'):
+        current.setdefault(job_id, []).append((score, similar_id))
+
+    displaced = Q(pk__in=[])
+    for job_id, score in candidates.items():
+        neighbors = sorted(current.get(job_id, []))
+        if len(neighbors) >= NEIGHBORS:
+            if score <= neighbors[0][0]:
+                continue
+            displaced |= Q(job_id=job_id, similar_id=neighbors[0][1])
+        created.append(SimilarJob(job_id=job_id, similar_id=job.id, score=score))
+
+    with transaction.atomic():
+        SimilarJob.objects.filter(Q(job=job) | Q(similar=job) | displaced).delete()
+        SimilarJob.objects.bulk_create(created)
+        JobTerm.objects.filter(job=job).delete()
+        JobTerm.objects.bulk_create(
+            JobTerm(job=job, term=term, weight=float(weight))
+            for term, weight in weights.items())
@@ -10,9 +10,57 @@ function showJob(jobId) {
     .then(response => response.text())
     .then(html => {
       document.getElementById('job-details').innerHTML = html;
+      loadJobState();
     });
 }
 
+// pages are the same for everyone, fill in saved/applied for this user
+function loadJobState() {
+  const elements = document.querySelectorAll('[data-job-state]:not([data-state-loaded])');
+  if (elements.length === 0) {
+    return;
+  }
+
+  const ids = [...new Set([...elements].map(el => el.dataset.jobState))];
+  fetch(`/jobs/state/?ids=${ids.join(',')}`)
+    .then(response => response.json())
+    .then(data => {
+      elements.forEach(el => {
+        const jobId = parseInt(el.dataset.jobState);
+        const apply = el.querySelector('.job-apply');
+        const applied = el.querySelector('.job-applied');
+        const login = el.querySelector('.job-login');
+        const save = el.querySelector('.job-save');
+        el.dataset.stateLoaded = '1';
+
+        if (!data.authenticated) {
+          // swap apply for a login link
+          if (apply && login) {
+            apply.classList.add('d-none');
+            login.classList.remove('d-none');
+          }
+          return;
+        }
+
+        if (applied && data.applied.includes(jobId)) {
+          apply.classList.add('d-none');
+          applied.classList.remove('d-none');
+        }
+
+        if (save) {
+          save.classList.remove('d-none');
+          if (data.saved.includes(jobId)) {
+            const icon = save.querySelector('i');
+            icon.classList.remove('bi-bookmark');
+            icon.classList.add('bi-bookmark-fill', 'text-primary');
+          }
+        }
+      });
+    });
+}
+
+document.addEventListener('DOMContentLoaded', loadJobState);
+
 function toggleSave(jobId, btn) {
   // send request to save/unsave job
   fetch(`/saved/${jobId}/`, {
@@ -35,6 +83,111 @@ function toggleSave(jobId, btn) {
     });
 }
 
+// infinite scroll for job list
+document.addEventListener('DOMContentLoaded', function () {
+  const feed = document.getElementById('job-feed');
+  if (!feed || !('IntersectionObserver' in window)) {
+    return;
+  }
+
+  const observer = new IntersectionObserver(entries => {
+    entries.forEach(entry => {
+      if (!entry.isIntersecting) {
+        return;
+      }
+
+      // stop watching so a slow response isn't fetched twice
+      const sentinel = entry.target;
+      observer.unobserve(sentinel);
+
+      fetch(sentinel.dataset.next)
+        .then(response => response.text())
+        .then(html => {
+          // swap the load more link for the next batch of cards
+          sentinel.insertAdjacentHTML('beforebegin', html);
+          sentinel.remove();
+          loadJobState();
+
+          const next = feed.querySelector('.feed-sentinel');
+          if (next) {
+            observer.observe(next);
+          }
+        });
+    });
+  }, { rootMargin: '300px' });
+
+  const sentinel = feed.querySelector('.feed-sentinel');
+  if (sentinel) {
+    observer.observe(sentinel);
+  }
+});
+
+// typeahead suggestions for search and location boxes
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('input[data-autocomplete]').forEach(input => {
+    const list = document.getElementById(input.getAttribute('list'));
+    let timer = null;
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      const query = input.value.trim();
+      if (!query) {
+        list.innerHTML = '';
+        return;
+      }
+
+      // wait for the user to stop typing before asking the server
+      timer = setTimeout(() => {
+        fetch(`${input.dataset.autocomplete}&q=${encodeURIComponent(query)}`)
+          .then(response => response.json())
+          .then(data => {
+            list.innerHTML = '';
+            data.suggestions.forEach(suggestion => {
+              const option = document.createElement('option');
+              option.value = suggestion.text;
+              list.appendChild(option);
+            });
+          });
+      }, 150);
+    });
+  });
+});
+
+// bulk accept/reject on the applicants table
+document.addEventListener('DOMContentLoaded', function () {
+  const table = document.getElementById('applications-table');
+  if (!table) {
+    return;
+  }
+
+  // tick every row on the page
+  table.addEventListener('change', function (e) {
+    if (e.target.id === 'select-all') {
+      table.querySelectorAll('input[name="ids"]').forEach(box => {
+        box.checked = e.target.checked;
+      });
+    }
+  });
+
+  // post the form and swap in the refreshed table instead of reloading
+  table.addEventListener('submit', function (e) {
+    if (e.target.id !== 'bulk-form') {
+      return;
+    }
+    e.preventDefault();
+
+    fetch(e.target.action, {
+      method: 'POST',
+      headers: { 'X-Requested-With': 'XMLHttpRequest' },
+      body: new FormData(e.target, e.submitter),
+    })
+      .then(response => response.text())
+      .then(html => {
+        table.innerHTML = html;
+      });
+  });
+});
+
 // get csrf token
 function getCookie(name) {
   let cookieValue = null;
@@ -0,0 +1,169 @@
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5  # runs before a task is given up on (dead)
+VISIBILITY_TIMEOUT = 300  # seconds a worker holds a task before others may retry it
+BACKOFF_BASE = 10  # seconds before the first retry, doubled on every retry
+BACKOFF_MAX = 3600
+BATCH_SIZE = 10  # tasks claimed at once
+POLL_INTERVAL = 1.0  # seconds an idle worker sleeps
+
+
+def task(max_attempts=MAX_ATTEMPTS):
+    """
+    mark a function as a background task, func.delay(*args, **kwargs)
+    queues it. arguments are stored as json, pass ids, not model objects
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        def delay(*args, **kwargs):
+            return enqueue(name, args, kwargs, max_attempts=max_attempts)
+
+        func.task_name = name
+        func.delay = delay
+        return func
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, run_at=None, max_attempts=MAX_ATTEMPTS):
+    """
+    add a task, it is part of the caller's transaction so work is only
+    queued when the data it needs is committed
+    """
+    from .models import Task
+
+    return Task.objects.create(
+        name=name, args=list(args), kwargs=kwargs or {},
+        run_at=run_at or timezone.now(), max_attempts=max_attempts)
+
+
+def backoff(attempts):
+    """seconds before retry number attempts, doubling with jitter"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def due(now):
+    return (Q(status='queued', run_at__lte=now) |
+            Q(status='running', locked_until__lt=now))
+
+
+def claim(worker, limit=BATCH_SIZE, visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    lock up to limit due tasks for this worker. the UPDATE re-checks that
+    each task is still due, so two workers never get the same task while
+    its lock lasts. execute() extends the lock before running each one
+    """
+    from .models import Task
+
+    now = timezone.now()
+    ids = list(Task.objects.filter(due(now)).order_by('run_at')
+               .values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    Task.objects.filter(due(now), id__in=ids).update(
+        status='running', locked_by=token,
+        locked_until=now + timedelta(seconds=visibility_timeout),
+        attempts=F('attempts') + 1)
+    return list(Task.objects.filter(locked_by=token).order_by('run_at'))
+
+
+def execute(task, visibility_timeout=VISIBILITY_TIMEOUT):
+    """run one claimed task, returns True when it succeeded"""
+    from .models import Task
+
+    # only the worker still holding the lock records the outcome
+    holding = Task.objects.filter(id=task.id, locked_by=task.locked_by)
+    unlock = {'locked_by': '', 'locked_until': None}
+
+    # the whole batch was locked when claimed, start this task's timeout
+    # now so it doesn't run out while the tasks before it ran
+    if not holding.update(
+            locked_until=timezone.now() + timedelta(seconds=visibility_timeout)):
+        # the lock ran out and another worker claimed it
+        return False
+
+    try:
+        if task.attempts > task.max_attempts:
+            # a worker died running it too many times
+            raise RuntimeError('Lock expired too many times.')
+        import_string(task.name)(*task.args, **task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            logger.error('Task %s (%s) is dead: %s', task.id, task.name, error)
+            holding.update(status='dead', last_error=error,
+                           finished_at=timezone.now(), **unlock)
+        else:
+            run_at = timezone.now() + timedelta(seconds=backoff(task.attempts))
+            holding.update(status='queued', last_error=error, run_at=run_at, **unlock)
+        return False
+
+    holding.update(status='done', finished_at=timezone.now(), **unlock)
+    return True
+
+
+def run_pending(worker='inline', limit=None):
+    """run due tasks in this process until none are left, returns how many ran"""
+    count = 0
+    while limit is None or count < limit:
+        batch = claim(worker, BATCH_SIZE if limit is None else min(BATCH_SIZE, limit - count))
+        if not batch:
+            break
+        for task in batch:
+            execute(task)
+            count += 1
+    return count
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def work(should_stop, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL,
+         visibility_timeout=VISIBILITY_TIMEOUT):
+    """worker loop, claims and runs tasks until should_stop() is true"""
+    worker = worker_name()
+    while not should_stop():
+        close_old_connections()
+        batch = claim(worker, batch_size, visibility_timeout)
+        if not batch:
+            time.sleep(poll_interval)
+            continue
+        for task in batch:
+            execute(task, visibility_timeout)
+            if should_stop():
+                # the rest are picked up again once their lock expires
+                break
+
+
+def requeue(tasks):
+    """give dead tasks another full set of attempts"""
+    return tasks.filter(status='dead').update(
+        status='queued', attempts=0, run_at=timezone.now(), finished_at=None)
+
+
+def prune(older_than=timedelta(days=7)):
+    """delete finished tasks, returns how many"""
+    from .models import Task
+
+    cutoff = timezone.now() - older_than
+    deleted, _ = Task.objects.filter(
+        status='done', finished_at__lt=cutoff).delete()
+    return deleted
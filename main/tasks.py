@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from . import recommendations, similar
+from .taskqueue import task
+
+NOTIFY_BATCH = 100  # applications per notification task
+
+STATUS_MESSAGES = {
+    'accepted': 'Congratulations, {company} accepted your application for {title}.',
+    'rejected': '{company} has decided not to move forward with your application for {title}.',
+}
+
+
+@task()
+def refresh_job(job_id):
+    """recommendations and similar jobs of a new, edited or closed job"""
+    from .models import Job
+
+    job = Job.objects.filter(id=job_id).first()
+    if job is None:
+        # deleted since, its rows went with it
+        return
+    recommendations.update_job(job)
+    similar.update_job(job)
+
+
+@task()
+def refresh_student(user_id):
+    recommendations.update_student(user_id)
+
+
+@task()
+def delete_job(job_id):
+    """the job and everything hanging off it, can be thousands of rows"""
+    from .models import Job
+
+    job = Job.objects.filter(id=job_id).first()
+    if job is not None:
+        job.delete()
+
+
+@task()
+def notify_applicants(app_ids):
+    """email students whose application was accepted or rejected"""
+    from .models import Application
+
+    applications = Application.objects.filter(
+        id__in=app_ids, status__in=STATUS_MESSAGES
+    ).select_related(
+        'applicant', 'job__employer__userprofile__employerprofile')
+
+    emails = []
+    for app in applications:
+        if not app.applicant.email:
+            continue
+        title = app.job.title
+        company = app.job.employer.userprofile.employerprofile.company_name
+        emails.append(EmailMessage(
+            subject=f'Update on your application for {title}',
+            body=STATUS_MESSAGES[app.status].format(company=company, title=title),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[app.applicant.email],
+        ))
+
+    # one connection for the whole batch
+    if emails:
+        get_connection().send_messages(emails)
+
+
+def notify_status_change(app_ids):
+    app_ids = list(app_ids)
+    for i in range(0, len(app_ids), NOTIFY_BATCH):
+        notify_applicants.delay(app_ids[i:i + NOTIFY_BATCH])
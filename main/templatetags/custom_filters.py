@@ -1,6 +1,9 @@
 from django import template
 from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from datetime import timedelta
+from main.search import SNIPPET_START, SNIPPET_END
 
 register = template.Library()
 
@@ -49,4 +52,19 @@ def time_ago(value):
         return f'{months}mo ago'
     else:
         years = int(seconds / 31536000)
-        return f'{years}y ago'
\ No newline at end of file
+        return f'{years}y ago'
+
+@register.filter
+def get_item(dictionary, key):
+    """look up a dict key that isn't a valid template variable (annual-plus)"""
+    return dictionary.get(key) if dictionary else None
+
+@register.filter
+def highlight(value):
+    """escape a search snippet and wrap matched words in <mark>"""
+    if not value:
+        return ''
+
+    text = escape(value)
+    text = text.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+    return mark_safe(text)
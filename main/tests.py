@@ -1,3 +1,751 @@
-from django.test import TestCase
+import json
+import re
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import HASH_SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.template.backends.django import Template
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import (caching, counters, fragments, profiling, ranking, resumes,
+               search, seeding, taskqueue, thumbnails)
+from .autocomplete import suggestions
+from .models import (Application, EmployerProfile, Job, Recommendation, Saved,
+                     StudentProfile, Task)
+
+# rows behind every list: one, a partly filled page, more than a page
+# of every paginated view (10 and 20 per page)
+VOLUMES = [1, 8, 25]
+
+# most queries a request may make with an empty cache, the worst case.
+# the same for every volume, a query per rendered row fails the test
+GET_BUDGETS = [
+    # (name, role, path, budget)
+    ('home', 'anonymous', '/', 1),
+    ('home', 'student', '/', 7),
+    ('login', 'anonymous', '/login/', 0),
+    ('register', 'anonymous', '/register/', 0),
+    ('job_list', 'anonymous', '/jobs/', 2),
+    ('job_list', 'student', '/jobs/', 8),
+    ('job_list', 'anonymous', '/jobs/?search=developer', 2),
+    # count, page and the page's snippets
+    ('job_list', 'anonymous', '/jobs/?search=developer&sort=relevance', 4),
+    ('job_list', 'anonymous', '/jobs/?sort=pay&workplace=onsite', 2),
+    ('job_list', 'anonymous', '/jobs/?cursor={cursor}', 2),
+    ('job_feed', 'anonymous', '/jobs/feed/?cursor={cursor}', 1),
+    ('job_autocomplete', 'anonymous', '/jobs/autocomplete/?q=dev', 2),
+    ('job_state', 'student', '/jobs/state/?ids={job_ids}', 4),
+    ('job_detail_panel', 'anonymous', '/jobs/partial/{job_id}/', 1),
+    ('job_detail_full', 'anonymous', '/jobs/{job_id}/', 2),
+    ('applied_jobs', 'student', '/student/applied/', 8),
+    ('applied_jobs', 'student', '/student/applied/?page=2', 8),
+    ('applied_jobs', 'student', '/student/applied/?search=developer', 8),
+    ('saved_jobs', 'student', '/student/saved/', 9),
+    ('saved_jobs', 'student', '/student/saved/?status=active&page=2', 9),
+    ('student_profile', 'student', '/student/profile', 8),
+    ('apply_job', 'student', '/student/apply/{job_id}/', 10),
+    ('employer_profile', 'employer', '/employer/profile', 8),
+    ('create_job', 'employer', '/employer/create/', 9),
+    ('edit_job', 'employer', '/employer/edit/{job_id}/', 7),
+    ('my_jobs', 'employer', '/employer/my-jobs/', 8),
+    ('my_jobs', 'employer', '/employer/my-jobs/?page=2', 8),
+    ('view_applications', 'employer', '/employer/applications/{job_id}/', 8),
+    ('view_applications', 'employer', '/employer/applications/{job_id}/?page=2', 8),
+    ('view_applications', 'employer', '/employer/applications/{job_id}/?sort=match', 10),
+    ('download_resume', 'employer', '/application/{app_id}/resume/', 3),
+]
+
+POST_BUDGETS = [
+    # (name, role, path, data, budget)
+    ('toggle_save', 'student', '/saved/{job_id}/', {}, 5),
+    ('toggle_job_status', 'employer', '/employer/toggle-status/{job_id}/', {}, 12),
+    ('delete_job', 'employer', '/employer/delete/{job_id}/', {}, 15),
+    ('accept_application', 'employer', '/application/{app_id}/accept/', {}, 9),
+    ('reject_application', 'employer', '/application/{app_id}/reject/', {}, 9),
+    ('bulk_update_applications', 'employer', '/employer/applications/{job_id}/bulk/',
+     {'action': 'accept', 'scope': 'filter'}, 14),
+    ('logout', 'student', '/logout/', {}, 4),
+]
+
+
+def build(rows):
+    """
+    an employer with rows jobs, rows students who applied to its newest
+    job, and a student who applied to and saved every job
+    """
+    seeding.seed(employers=1, students=rows, jobs=rows, applications=0,
+                 saves=0, seed=rows)
+    employer = User.objects.get(userprofile__role='employer')
+    students = list(User.objects.filter(userprofile__role='student').order_by('id'))
+    jobs = list(Job.objects.order_by('-created_at', '-id'))
+    Job.objects.filter(id=jobs[0].id).update(status='active')
+
+    resume = resumes.store(ContentFile(seeding.RESUME, name='resume.pdf'))
+    Application.objects.bulk_create(
+        [Application(job=jobs[0], applicant=student, resume=resume)
+         for student in students] +
+        [Application(job=job, applicant=students[0], resume=resume)
+         for job in jobs[1:]])
+    Saved.objects.bulk_create([Saved(user=students[0], job=job) for job in jobs])
+    seeding.refresh_derived()
+    # home always shows recommendations, not featured jobs at some volumes
+    Recommendation.objects.get_or_create(
+        user=students[0], job=jobs[0], defaults={'score': 1.0})
+    # every volume is rolled back, build the in-memory indexes again
+    # like a freshly started worker would
+    suggestions.built = False
+    ranking.skills.built = False
+
+    return {
+        'employer': employer,
+        'student': students[0],
+        'job_id': jobs[0].id,
+        'job_ids': ','.join(str(job.id) for job in jobs[:20]),
+        'app_id': Application.objects.filter(job=jobs[0]).earliest('id').id,
+    }
+
+
+def normalize(sql):
+    """sql with its literals taken out, a query per row shows up as one shape"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'\(\?(?:, \?)*\)', '(...)', sql)
+
+
+def duplicated_queries(queries):
+    """(count, sql) of every query shape run more than once, most first"""
+    shapes = Counter(normalize(query['sql']) for query in queries)
+    return [(count, sql) for sql, count in shapes.most_common() if count > 1]
+
+
+def describe_queries(queries):
+    lines = [f'{len(queries)} queries']
+    duplicated = duplicated_queries(queries)
+    if duplicated:
+        lines.append('duplicated:')
+        lines += [f'  {count}x {sql}' for count, sql in duplicated]
+    lines.append('all:')
+    lines += [f'  {query["sql"]}' for query in queries]
+    return '\n'.join(lines)
+
+
+class MediaTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # uploads go to a directory of their own, not the real MEDIA_ROOT
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+
+class QueryBudgetTestCase(MediaTestCase):
+
+    @contextmanager
+    def assertQueryBudget(self, budget, label=''):
+        """fail with the duplicated sql when the block runs more than budget queries"""
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        if len(queries) > budget:
+            self.fail(f'{label} ran over its budget of {budget} queries\n'
+                      f'{describe_queries(queries)}')
+
+    def client_for(self, role, data):
+        client = self.client_class()
+        if role != 'anonymous':
+            client.force_login(data[role])
+        return client
+
+    def first_cursor(self, client):
+        response = client.get('/jobs/')
+        return response.context['jobs'].next_cursor or ''
+
+
+class ViewQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_get_views(self):
+        counts = {}
+        for rows in VOLUMES:
+            with self.subTest(rows=rows), transaction.atomic():
+                data = build(rows)
+                data['cursor'] = self.first_cursor(self.client_for('anonymous', data))
+                for name, role, path, budget in GET_BUDGETS:
+                    client = self.client_for(role, data)
+                    url = path.format(**data)
+                    cache.clear()
+                    with self.assertQueryBudget(budget, f'{role} GET {url}') as queries:
+                        response = client.get(url)
+                    self.assertEqual(response.status_code, 200, url)
+                    counts.setdefault((role, path), {})[rows] = len(queries)
+                transaction.set_rollback(True)
+
+        for (role, path), by_rows in counts.items():
+            with self.subTest(role=role, path=path):
+                self.assertEqual(len(set(by_rows.values())), 1,
+                                 f'query count changes with rows: {by_rows}')
+
+    def test_post_views(self):
+        counts = {}
+        for rows in VOLUMES:
+            for name, role, path, post, budget in POST_BUDGETS:
+                with self.subTest(rows=rows, view=name), transaction.atomic():
+                    data = build(rows)
+                    client = self.client_for(role, data)
+                    url = path.format(**data)
+                    cache.clear()
+                    with self.assertQueryBudget(budget, f'{role} POST {url}') as queries:
+                        response = client.post(url, post)
+                    self.assertLess(response.status_code, 400, url)
+                    counts.setdefault(name, {})[rows] = len(queries)
+                    transaction.set_rollback(True)
+
+        for name, by_rows in counts.items():
+            with self.subTest(view=name):
+                self.assertEqual(len(set(by_rows.values())), 1,
+                                 f'query count changes with rows: {by_rows}')
+
+
+class DuplicatedQueryTests(TestCase):
+
+    def test_rows_of_one_query_are_grouped(self):
+        queries = [
+            {'sql': 'SELECT * FROM "main_job" WHERE "main_job"."id" = 1'},
+            {'sql': 'SELECT * FROM "main_job" WHERE "main_job"."id" = 2'},
+            {'sql': "SELECT * FROM \"auth_user\" WHERE \"username\" = 'a'"},
+        ]
+        self.assertEqual(duplicated_queries(queries), [
+            (2, 'SELECT * FROM "main_job" WHERE "main_job"."id" = ?'),
+        ])
+
+    def test_in_lists_of_any_length_match(self):
+        self.assertEqual(
+            normalize('SELECT 1 FROM "main_saved" WHERE "job_id" IN (1, 2, 3)'),
+            normalize('SELECT 1 FROM "main_saved" WHERE "job_id" IN (4)'))
+
+
+class ApplicationCounterTests(MediaTestCase):
+
+    def setUp(self):
+        self.data = build(3)
+        self.jobs = list(Job.objects.order_by('-created_at', '-id'))
+        self.students = list(User.objects.filter(
+            userprofile__role='student').order_by('id'))
+        self.employer = self.client_class()
+        self.employer.force_login(self.data['employer'])
+
+    def assertCounters(self):
+        """every job's counters match its applications, nothing to reconcile"""
+        for job in Job.objects.all():
+            applications = Application.objects.filter(job=job)
+            self.assertEqual(job.application_count, applications.count())
+            for status, field in counters.STATUS_COUNTERS.items():
+                self.assertEqual(getattr(job, field),
+                                 applications.filter(status=status).count(),
+                                 f'{field} of job {job.id}')
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_counters_follow_applications(self):
+        self.assertCounters()
+
+        # apply
+        student = self.client_class()
+        student.force_login(self.students[1])
+        response = student.post(f'/student/apply/{self.jobs[1].id}/', {
+            'resume': SimpleUploadedFile('cv.pdf', seeding.RESUME,
+                                         content_type='application/pdf')})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.jobs[1].applications.count(), 2)
+        self.assertCounters()
+
+        # accept, then change to reject
+        app_id = self.data['app_id']
+        for action in ['accept', 'reject']:
+            self.employer.post(f'/application/{app_id}/{action}/')
+            self.assertCounters()
+
+        # bulk by filter, then by ticked ids
+        bulk = f'/employer/applications/{self.jobs[0].id}/bulk/'
+        self.employer.post(bulk, {'action': 'accept', 'scope': 'filter'})
+        self.assertCounters()
+        ids = list(self.jobs[0].applications.values_list('id', flat=True)[:2])
+        self.employer.post(bulk, {'action': 'reject', 'ids': ids + ['x']})
+        self.assertCounters()
+        self.assertEqual(self.jobs[0].applications.filter(status='rejected').count(), 2)
+
+        # delete one application, then a whole job and its applications
+        Application.objects.get(id=app_id).delete()
+        self.assertCounters()
+        self.employer.post(f'/employer/delete/{self.jobs[0].id}/')
+        taskqueue.run_pending()
+        self.assertFalse(Job.objects.filter(id=self.jobs[0].id).exists())
+        self.assertCounters()
+
+
+class ResumeDownloadTests(MediaTestCase):
+
+    def setUp(self):
+        self.data = build(2)
+        self.url = f'/application/{self.data["app_id"]}/resume/'
+        application = Application.objects.get(id=self.data['app_id'])
+        self.applicant = application.applicant
+        self.name = application.resume.name
+        # someone else's students and employer
+        seeding.seed(employers=1, students=1, jobs=0, applications=0, saves=0, seed=9)
+        self.client.force_login(self.data['employer'])
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_only_the_employer_and_applicant_can_download(self):
+        for user in [self.data['employer'], self.applicant]:
+            self.client.force_login(user)
+            response = self.get()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.content(response), seeding.RESUME)
+
+        # another applicant to the same job, another employer and student
+        others = User.objects.exclude(
+            id__in=[self.data['employer'].id, self.applicant.id])
+        self.assertEqual(others.count(), 3)
+        for user in others:
+            self.client.force_login(user)
+            self.assertEqual(self.get().status_code, 404, user.username)
+
+        self.client.logout()
+        self.assertEqual(self.get().status_code, 302)
+
+    def test_range(self):
+        size = len(seeding.RESUME)
+        response = self.get(range='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{size}')
+        self.assertEqual(self.content(response), seeding.RESUME[:10])
+
+        response = self.get(range='bytes=-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes {size - 5}-{size - 1}/{size}')
+        self.assertEqual(self.content(response), seeding.RESUME[-5:])
+
+    def test_unsatisfiable_range(self):
+        size = len(seeding.RESUME)
+        response = self.get(range=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_range(self):
+        etag = self.get()['ETag']
+        response = self.get(range='bytes=0-9', if_range=etag)
+        self.assertEqual(response.status_code, 206)
+
+        # the file changed since the first part was fetched, start over
+        response = self.get(range='bytes=0-9', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), seeding.RESUME)
+
+    @override_settings(RESUME_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_sendfile(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.name}')
+        self.assertEqual(response.content, b'')
+
+
+class SkillMatrixTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.job = Job.objects.get(id=build(2)['job_id'])
+        Job.objects.filter(id=self.job.id).update(title='Python Developer')
+        self.job.refresh_from_db()
+        self.student = StudentProfile.objects.order_by('id').first()
+        ranking.skills.build()
+
+    def stale(self):
+        ranking.skills.built_at -= ranking.REBUILD_INTERVAL + 1
+
+    def matched(self):
+        user_id = self.student.user_profile.user_id
+        return ranking.skills.score(self.job, [user_id])[1][0]
+
+    def test_own_save_is_overlaid_without_a_rebuild(self):
+        self.student.skills = 'python'
+        self.student.save()
+        self.stale()
+        with mock.patch.object(ranking.skills, 'build') as rebuild, \
+                mock.patch.object(ranking.threading, 'Thread') as thread:
+            self.assertEqual(self.matched(), 1)
+        rebuild.assert_not_called()
+        thread.assert_not_called()
+
+    def test_another_workers_save_rebuilds_in_the_background(self):
+        caching.bump_version('student_skills')
+        self.stale()
+        with mock.patch.object(ranking.threading, 'Thread') as thread:
+            self.matched()
+        thread.assert_called_once()
+        ranking.skills.rebuilding = False
+
+    def test_build_reads_profiles_outside_the_lock(self):
+        parse_skills = ranking.parse_skills
+
+        # called per profile row as it is read
+        def unlocked(text):
+            self.assertFalse(ranking.skills.lock.locked())
+            return parse_skills(text)
+
+        with mock.patch.object(ranking, 'parse_skills', unlocked):
+            ranking.skills.build()
+
+
+class IdentityTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = build(1)['student']
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get('/'), 'Logout')
+
+    def change_password(self):
+        self.user.set_password('changed')
+        self.user.save()
+
+    def test_password_changed_elsewhere_logs_out(self):
+        self.change_password()
+        self.assertNotContains(self.client.get('/'), 'Logout')
+
+    def test_session_with_the_new_hash_stays_logged_in(self):
+        self.change_password()
+        session = self.client.session
+        session[HASH_SESSION_KEY] = self.user.get_session_auth_hash()
+        session.save()
+        self.assertContains(self.client.get('/'), 'Logout')
+
+    def test_saving_last_login_keeps_the_cached_identity(self):
+        self.user.save(update_fields=['last_login'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.client.get('/'), 'Logout')
+        self.assertFalse([query for query in queries
+                          if 'FROM "auth_user"' in query['sql']])
+
+
+class SearchRankTests(MediaTestCase):
+
+    def seed(self, rows):
+        """rows open jobs that all mention zebra somewhere"""
+        seeding.seed(employers=1, students=0, jobs=rows, applications=0,
+                     saves=0, seed=rows)
+        Job.objects.update(status='active', job_description='<p>Keeps a zebra fed.</p>')
+        search.rebuild()
+        return list(Job.objects.order_by('id'))
+
+    def test_title_matches_rank_first(self):
+        jobs = self.seed(3)
+        Job.objects.filter(id=jobs[1].id).update(title='Zebra Keeper')
+        Job.objects.filter(id=jobs[2].id).update(
+            job_description='<p>Feeds a zebra and grooms a zebra.</p>')
+        search.rebuild()
+
+        ranked = list(search.rank_jobs(Job.objects.all(), 'zebra'))
+        self.assertEqual(ranked[0].id, jobs[1].id)
+        self.assertEqual(ranked[1].id, jobs[2].id)
+        self.assertEqual([job.search_rank for job in ranked],
+                         sorted(job.search_rank for job in ranked))
+
+        search.attach_snippets(ranked, 'zebra')
+        self.assertEqual(ranked[1].search_snippet.count(
+            f'{search.SNIPPET_START}zebra{search.SNIPPET_END}'), 2)
+
+    def test_query_count_is_flat(self):
+        counts = {}
+        for rows in (5, 45):
+            with transaction.atomic():
+                self.seed(rows)
+                for page in (1, 2):
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(
+                            f'/jobs/?search=zebra&sort=relevance&page={page}')
+                    self.assertContains(response, '<mark>zebra</mark>')
+                    counts.setdefault(page, {})[rows] = len(queries)
+                transaction.set_rollback(True)
+
+        for page, by_rows in counts.items():
+            with self.subTest(page=page):
+                self.assertEqual(len(set(by_rows.values())), 1,
+                                 f'query count changes with rows: {by_rows}')
+
+
+def png(color='red'):
+    output = BytesIO()
+    Image.new('RGB', (300, 150), color).save(output, 'PNG')
+    return SimpleUploadedFile('logo.png', output.getvalue(), content_type='image/png')
+
+
+class ThumbnailTests(MediaTestCase):
+
+    def setUp(self):
+        seeding.seed(employers=1, students=0, jobs=1, applications=0, saves=0, seed=1)
+        self.profile = EmployerProfile.objects.get()
+        self.client.force_login(self.profile.user_profile.user)
+
+    def upload(self, logo):
+        data = {field: getattr(self.profile, field) for field in (
+            'first_name', 'last_name', 'company_name', 'phone',
+            'company_address', 'industry', 'company_size', 'description')}
+        data['logo'] = logo
+        response = self.client.post('/employer/profile', data)
+        self.assertEqual(response.status_code, 302)
+        self.profile.refresh_from_db()
+        return self.profile.logo
+
+    def test_thumbnails_are_shown_once_recorded(self):
+        logo = self.upload(png())
+        self.assertEqual(self.profile.logo_thumbnailed, logo.name)
+        # rendering trusts the recorded name, storage is never asked
+        with mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError):
+            card = self.profile.logo_thumbnails['card']
+        self.assertTrue(card.endswith('.card.webp'))
+
+    def test_original_is_shown_until_thumbnails_are_recorded(self):
+        self.upload(png())
+        # replaced outside the profile page, e.g. in the admin
+        self.profile.logo = 'company_logos/other.png'
+        self.assertEqual(self.profile.logo_thumbnails,
+                         {size: self.profile.logo.url for size in thumbnails.SIZES})
+
+    def test_build_thumbnails_records_existing_ones(self):
+        logo = self.upload(png())
+        EmployerProfile.objects.update(logo_thumbnailed='')
+        out = StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn('Generated thumbnails for 0 images, 1 already done', out.getvalue())
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.logo_thumbnailed, logo.name)
+
+    def test_replaced_logo_thumbnails_are_deleted(self):
+        old = self.upload(png())
+        old_names = [thumbnails.thumbnail_name(old.name, size) for size in thumbnails.SIZES]
+        new = self.upload(png('blue'))
+
+        self.assertNotEqual(new.name, old.name)
+        self.assertTrue(thumbnails.exists(new))
+        self.assertFalse(any(new.storage.exists(name) for name in old_names))
+
+
+class ProfilingTests(MediaTestCase):
+
+    def setUp(self):
+        seeding.seed(employers=1, students=0, jobs=3, applications=0, saves=0, seed=1)
+
+    def timings(self, response):
+        timings = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, duration, *desc = entry.split(';')
+            timings[name] = (float(duration.removeprefix('dur=')), desc)
+        return timings
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_gets_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/jobs/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'tpl', 'view'})
+        self.assertEqual(timings['db'][1], [f'desc="{len(queries)} queries"'])
+        self.assertGreater(timings['tpl'][0], 0)
+        self.assertGreaterEqual(timings['view'][0], timings['tpl'][0])
+        # renders are only wrapped while the request runs
+        self.assertIs(Template.render, profiling._render)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_unresolved_request_has_no_view_time(self):
+        response = self.client.get('/no-such-page/')
+        self.assertEqual(set(self.timings(response)), {'db', 'tpl'})
+
+    @override_settings(PROFILING_SLOW_MS=0)
+    def test_slow_request_is_logged(self):
+        with self.assertLogs('main.profiling', 'WARNING') as logs:
+            response = self.client.get('/jobs/?search=developer')
+        self.assertNotIn('Server-Timing', response)
+
+        [line] = logs.output
+        record = json.loads(line.split(':', 2)[2])
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['path'], '/jobs/')
+        self.assertEqual(record['view'], 'job_list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreaterEqual(record['total_ms'], 0)
+        # sql details only for sampled requests
+        self.assertNotIn('queries', record)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_SLOW_MS=0)
+    def test_sampled_slow_request_logs_duplicated_queries(self):
+        with self.assertLogs('main.profiling', 'WARNING') as logs:
+            self.client.get('/jobs/')
+        record = json.loads(logs.output[0].split(':', 2)[2])
+        self.assertGreater(record['queries'], 0)
+        self.assertIsNotNone(record['view_ms'])
+        self.assertIsInstance(record['duplicated'], list)
+
+
+def succeed():
+    """a task that does nothing, queued by name in TaskQueueTests"""
+
+
+def fail():
+    raise ValueError('task failed')
+
+
+locks = []  # latest locked_until of a running task, seen by record_lock
+
+
+def record_lock():
+    locks.append(Task.objects.filter(status='running').latest('locked_until').locked_until)
+
+
+class FragmentCacheStatsTests(TestCase):
+
+    def test_refuses_a_per_process_cache(self):
+        with self.assertRaisesMessage(CommandError, 'LocMemCache'):
+            call_command('fragment_cache_stats')
+
+    def test_reports_from_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': location,
+                }}):
+            fragments.count('card', 3, 1)
+            out = StringIO()
+            call_command('fragment_cache_stats', '--reset', stdout=out)
+            self.assertIn('card   3 hits, 1 misses (75.0% hit rate)', out.getvalue())
+            self.assertEqual(fragments.get_stats()['card'], {'hits': 0, 'misses': 0})
+
+
+class TaskQueueTests(TestCase):
+
+    def expire(self, task):
+        Task.objects.filter(id=task.id).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_claimed_tasks_are_not_claimed_again(self):
+        for _ in range(3):
+            taskqueue.enqueue('main.tests.succeed')
+        first = taskqueue.claim('a', limit=2)
+        second = taskqueue.claim('b', limit=10)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({task.id for task in first} & {task.id for task in second})
+        self.assertEqual(taskqueue.claim('c'), [])
+
+    def test_failed_task_is_retried_after_backoff(self):
+        taskqueue.enqueue('main.tests.fail', max_attempts=3)
+        [task] = taskqueue.claim('a')
+        started = timezone.now()
+        self.assertFalse(taskqueue.execute(task))
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'queued')
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(task.locked_by, '')
+        self.assertIn('ValueError', task.last_error)
+        self.assertGreaterEqual(
+            task.run_at, started + timedelta(seconds=taskqueue.BACKOFF_BASE * 0.5))
+        # not due until the backoff has passed
+        self.assertEqual(taskqueue.claim('a'), [])
+
+    def test_backoff_doubles_up_to_the_maximum(self):
+        for attempts in range(1, 5):
+            delay = taskqueue.BACKOFF_BASE * 2 ** (attempts - 1)
+            self.assertTrue(delay / 2 <= taskqueue.backoff(attempts) <= delay)
+        self.assertLessEqual(taskqueue.backoff(30), taskqueue.BACKOFF_MAX)
+
+    def test_expired_lock_is_reclaimed(self):
+        taskqueue.enqueue('main.tests.succeed')
+        [stale] = taskqueue.claim('a')
+        self.assertEqual(taskqueue.claim('b'), [])
+
+        self.expire(stale)
+        [task] = taskqueue.claim('b')
+        self.assertEqual(task.id, stale.id)
+        self.assertEqual(task.attempts, 2)
+
+        # the first worker lost its lock, its outcome is not recorded
+        taskqueue.execute(stale)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'running')
+        self.assertTrue(taskqueue.execute(task))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'done')
+
+    def test_lock_is_extended_when_the_task_starts(self):
+        locks.clear()
+        taskqueue.enqueue('main.tests.record_lock')
+        [task] = taskqueue.claim('a', visibility_timeout=1)
+        started = timezone.now()
+        self.assertTrue(taskqueue.execute(task, visibility_timeout=300))
+        self.assertGreater(locks[0], started + timedelta(seconds=200))
+
+    def test_task_reclaimed_while_waiting_in_a_batch_is_skipped(self):
+        locks.clear()
+        for _ in range(2):
+            taskqueue.enqueue('main.tests.record_lock')
+        first, second = taskqueue.claim('a')
+        # the first task ran past the second one's lock
+        self.expire(second)
+        [taken] = taskqueue.claim('b')
+        self.assertEqual(taken.id, second.id)
+
+        self.assertTrue(taskqueue.execute(first))
+        self.assertFalse(taskqueue.execute(second))
+        self.assertEqual(len(locks), 1)
+        self.assertTrue(taskqueue.execute(taken))
+        self.assertEqual(len(locks), 2)
+
+    def test_task_is_dead_after_its_last_attempt(self):
+        taskqueue.enqueue('main.tests.fail', max_attempts=1)
+        [task] = taskqueue.claim('a')
+        with self.assertLogs('main.taskqueue', 'ERROR'):
+            self.assertFalse(taskqueue.execute(task))
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'dead')
+        self.assertIsNotNone(task.finished_at)
+        Task.objects.filter(id=task.id).update(run_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(taskqueue.claim('a'), [])
+
+    def test_task_whose_lock_keeps_expiring_is_dead(self):
+        taskqueue.enqueue('main.tests.succeed', max_attempts=1)
+        [task] = taskqueue.claim('a')
+        self.expire(task)
+        [task] = taskqueue.claim('b')
+        with self.assertLogs('main.taskqueue', 'ERROR'):
+            self.assertFalse(taskqueue.execute(task))
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'dead')
+        self.assertIn('Lock expired', task.last_error)
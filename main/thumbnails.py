@@ -0,0 +1,100 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# bounding box per use, twice the css size for high dpi screens
+SIZES = {
+    'card': (100, 100),  # .company-logo on job cards, 50px
+    'panel': (160, 160),  # job panel and job page header, 80px
+    'avatar': (64, 64),  # navbar, 32px, cropped square
+}
+CROPPED = {'avatar'}
+
+FORMAT = 'WEBP'
+EXTENSION = '.webp'
+QUALITY = 80
+
+
+def thumbnail_name(name, size):
+    """logos/acme.png -> logos/acme.card.webp, next to the original"""
+    root, _ = os.path.splitext(name)
+    return f'{root}.{size}{EXTENSION}'
+
+
+def url(image, size, thumbnailed):
+    """
+    thumbnail url, the original until generate() ran for this image.
+    thumbnailed is the image name recorded by record(), so no storage
+    lookup is needed while rendering
+    """
+    if not image:
+        return None
+    if image.name != thumbnailed:
+        return image.url
+    return image.storage.url(thumbnail_name(image.name, size))
+
+
+def urls(image, thumbnailed):
+    """url per thumbnail size, empty when there is no image"""
+    if not image:
+        return {}
+    return {size: url(image, size, thumbnailed) for size in SIZES}
+
+
+def render(original, size):
+    box = SIZES[size]
+    if size in CROPPED:
+        thumbnail = ImageOps.fit(original, box, Image.LANCZOS)
+    else:
+        thumbnail = original.copy()
+        thumbnail.thumbnail(box, Image.LANCZOS)
+
+    output = BytesIO()
+    thumbnail.save(output, FORMAT, quality=QUALITY, method=6)
+    return output.getvalue()
+
+
+def generate(image):
+    """write every thumbnail of an image field file, replacing old ones"""
+    if not image:
+        return []
+
+    with image.open('rb') as file:
+        original = Image.open(file)
+        # phone photos are often stored sideways with a rotation tag
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        original.load()
+
+    names = []
+    for size in SIZES:
+        name = thumbnail_name(image.name, size)
+        if image.storage.exists(name):
+            image.storage.delete(name)
+        names.append(image.storage.save(name, ContentFile(render(original, size))))
+    return names
+
+
+def record(instance, field):
+    """
+    remember which image instance.<field> the thumbnails were made from,
+    saved so cached cards and the navbar are rendered again with them
+    """
+    setattr(instance, f'{field}_thumbnailed', getattr(instance, field).name or '')
+    instance.save(update_fields=[f'{field}_thumbnailed'])
+
+
+def delete(storage, name):
+    """remove the thumbnails of a replaced or cleared image"""
+    if not name:
+        return
+    for size in SIZES:
+        storage.delete(thumbnail_name(name, size))
+
+
+def exists(image):
+    return all(image.storage.exists(thumbnail_name(image.name, size))
+               for size in SIZES)
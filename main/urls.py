@@ -10,6 +10,9 @@ urlpatterns = [
     
     # job details
     path('jobs/', views.job_list, name='job_list'),
+    path('jobs/feed/', views.job_feed, name='job_feed'),
+    path('jobs/autocomplete/', views.job_autocomplete, name='job_autocomplete'),
+    path('jobs/state/', views.job_state, name='job_state'),
     path('jobs/partial/<int:job_id>/', views.job_detail_panel, name='job_detail_panel'),
     path('jobs/<int:job_id>/', views.job_detail_full, name='job_detail_full'),
     path('saved/<int:job_id>/', views.toggle_save, name='toggle_save'),
@@ -28,6 +31,8 @@ urlpatterns = [
     path('employer/toggle-status/<int:job_id>/', views.toggle_job_status, name='toggle_job_status'),
     path('employer/delete/<int:job_id>/', views.delete_job, name='delete_job'),
     path('employer/applications/<int:job_id>/', views.view_applications, name='view_applications'),
+    path('employer/applications/<int:job_id>/bulk/', views.bulk_update_applications, name='bulk_update_applications'),
     path('application/<int:app_id>/accept/', views.accept_application, name='accept_application'),
     path('application/<int:app_id>/reject/', views.reject_application, name='reject_application'),
+    path('application/<int:app_id>/resume/', views.download_resume, name='download_resume'),
 ]
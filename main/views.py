@@ -1,22 +1,48 @@
-from datetime import timedelta
-from django.utils import timezone
-from django.http import JsonResponse
+import os
+
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, redirect
+from django.template.defaultfilters import pluralize
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q
 from django.core.paginator import Paginator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
 from .forms import ApplicationForm, EmployerProfileForm, JobForm, StudentProfileForm, UserRegistrationForm, LoginForm
 from .models import Application, Saved, EmployerProfile, Job, StudentProfile, UserProfile
+from . import (caching, counters, fragments, identity, ranking, resumes, search,
+               similar, tasks, thumbnails)
+from .autocomplete import suggestions
+from .pagination import keyset_paginate
+from .queries import COMPANY, job_cards
+from .routers import read_replica
+from .facets import date_posted_q, get_facet_counts, pay_range_q
 
 
+@read_replica
 def home(request):
-    featured_jobs = Job.objects.filter(status='active').select_related(
-        'employer__userprofile__employerprofile').order_by('-created_at')[:9]
+    jobs = job_cards(Job.objects.filter(status='active'))
+
+    # students get their precomputed recommendations, best match first
+    recommended = []
+    user = identity.get_identity(request)
+    if user and user['role'] == 'student':
+        recommended = list(jobs.filter(
+            recommendations__user_id=user['user_id']
+        ).order_by('-recommendations__score')[:9])
+
+    context = {
+        'featured_jobs': recommended or jobs.order_by('-created_at')[:9],
+        'recommended': bool(recommended),
+    }
 
-    return render(request, 'main/home.html', {'featured_jobs': featured_jobs})
+    return render(request, 'main/home.html', context)
 
 
 def register(request):
@@ -25,8 +51,9 @@ def register(request):
         if form.is_valid():
             user = form.save()
             login(request, user)
-            profile = UserProfile.objects.get(user=user)
-            return redirect('job_list' if profile.role == 'student' else 'my_jobs')
+            # profile was just created by the form, no need to fetch it
+            role = identity.remember(request, user, user.userprofile)['role']
+            return redirect('job_list' if role == 'student' else 'my_jobs')
 
     else:
         form = UserRegistrationForm()
@@ -45,8 +72,8 @@ def custom_login(request):
             user = authenticate(request, username=email, password=password)
             if user is not None:
                 login(request, user)
-                profile = UserProfile.objects.get(user=user)
-                return redirect('job_list' if profile.role == 'student' else 'my_jobs')
+                role = identity.remember(request, user)['role']
+                return redirect('job_list' if role == 'student' else 'my_jobs')
             else:
                 messages.error(request, 'Invalid username or password.')
     else:
@@ -67,11 +94,19 @@ def employer_profile(request):
 
     profile, created = EmployerProfile.objects.get_or_create(
         user_profile=user_profile)
+    # the form replaces the field on profile, remember whose thumbnails to remove
+    old_image = profile.logo.name
     form = EmployerProfileForm(
         request.POST or None, request.FILES or None, instance=profile)
 
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        profile = form.save()
+        # small copies for cards, panels and the navbar
+        if 'logo' in form.changed_data:
+            if old_image != profile.logo.name:
+                thumbnails.delete(profile.logo.storage, old_image)
+            thumbnails.generate(profile.logo)
+            thumbnails.record(profile, 'logo')
         messages.success(request, 'Profile updated successfully!')
         return redirect('employer_profile')
 
@@ -90,11 +125,19 @@ def student_profile(request):
 
     profile, created = StudentProfile.objects.get_or_create(
         user_profile=user_profile)
+    # the form replaces the field on profile, remember whose thumbnails to remove
+    old_image = profile.profile_img.name
     form = StudentProfileForm(request.POST or None,
                               request.FILES or None, instance=profile)
 
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        profile = form.save()
+        # small copies for cards, panels and the navbar
+        if 'profile_img' in form.changed_data:
+            if old_image != profile.profile_img.name:
+                thumbnails.delete(profile.profile_img.storage, old_image)
+            thumbnails.generate(profile.profile_img)
+            thumbnails.record(profile, 'profile_img')
         messages.success(request, 'Profile updated successfully!')
         return redirect('student_profile')
 
@@ -168,29 +211,27 @@ def edit_job(request, job_id):
     })
 
 
-def job_list(request):  # public view
-    jobs = Job.objects.filter(status='active').order_by('-created_at')
-
-    saved_jobs = []
-    if request.user.is_authenticated:
-        saved_jobs = Saved.objects.filter(
-            user=request.user).values_list('job_id', flat=True)
+def filter_job_list(request):
+    """apply the job list search and filters, shared by job_list and job_feed"""
+    jobs = job_cards(Job.objects.filter(status='active')).order_by('-created_at')
 
     # filtering logic
     search_query = request.GET.get('search', '')
     location_query = request.GET.get('location', '')
     workplace_query = request.GET.get('workplace', '')
     work_type_query = request.GET.get('work_type', '')
+    pay_type_query = request.GET.get('pay_type', '')
+    min_pay_query = request.GET.get('min_pay', '')
+    max_pay_query = request.GET.get('max_pay', '')
     date_posted = request.GET.get('date_posted', '')
+    sort = request.GET.get('sort', '')
 
     # can search by title, company, desc, summary
     if search_query:
-        jobs = jobs.filter(
-            Q(title__icontains=search_query) |
-            Q(employer__userprofile__employerprofile__company_name__icontains=search_query) |
-            Q(job_description__icontains=search_query) |
-            Q(summary__icontains=search_query)
-        )
+        if sort == 'relevance':
+            jobs = search.rank_jobs(jobs, search_query)
+        else:
+            jobs = search.filter_jobs(jobs, search_query)
 
     if location_query:
         jobs = jobs.filter(location__icontains=location_query)
@@ -201,78 +242,141 @@ def job_list(request):  # public view
     if work_type_query:
         jobs = jobs.filter(work_type=work_type_query)
 
-    if date_posted:
-        today = timezone.now().date()
-        if date_posted == "today":
-            jobs = jobs.filter(created_at__date=today)
-        elif date_posted == "3days":
-            jobs = jobs.filter(created_at__gte=today - timedelta(days=3))
-        elif date_posted == "7days":
-            jobs = jobs.filter(created_at__gte=today - timedelta(days=7))
-        elif date_posted == "14days":
-            jobs = jobs.filter(created_at__gte=today - timedelta(days=14))
-        elif date_posted == "30days":
-            jobs = jobs.filter(created_at__gte=today - timedelta(days=30))
+    if pay_type_query:
+        jobs = jobs.filter(pay_type=pay_type_query)
 
-    # 20 jobs per page
-    paginator = Paginator(jobs, 20)
-    page_number = request.GET.get('page')
-    jobs_page = paginator.get_page(page_number)
+    if min_pay_query or max_pay_query:
+        jobs = jobs.filter(pay_range_q(min_pay_query, max_pay_query))
 
-    context = {
-        'jobs': jobs_page,
-        'saved_jobs': saved_jobs,
+    if date_posted:
+        jobs = jobs.filter(date_posted_q(date_posted))
+
+    filters = {
         'search_query': search_query,
         'location_query': location_query,
         'workplace_query': workplace_query,
         'work_type_query': work_type_query,
+        'pay_type_query': pay_type_query,
+        'min_pay_query': min_pay_query,
+        'max_pay_query': max_pay_query,
         'date_posted': date_posted,
+        'sort': sort,
+    }
+    return jobs, filters
+
+
+def paginate_job_list(request, jobs, filters):
+    # relevance results use page numbers, the other orders use cursors
+    if filters['search_query'] and filters['sort'] == 'relevance':
+        paginator = Paginator(jobs, 20)
+        jobs_page = paginator.get_page(request.GET.get('page'))
+        search.attach_snippets(jobs_page, filters['search_query'])
+        return jobs_page
+
+    keys = ('created_at', 'id')
+    if filters['sort'] == 'pay':
+        keys = ('annual_pay_max', 'id')
+
+    # 20 jobs per page
+    return keyset_paginate(
+        jobs, request.GET.get('cursor'), per_page=20, keys=keys)
+
+
+@read_replica
+def job_list(request):  # public view
+    jobs, filters = filter_job_list(request)
+    jobs_page = paginate_job_list(request, jobs, filters)
+    fragments.attach_cards(jobs_page)
+
+    context = {
+        'jobs': jobs_page,
+        'facets': get_facet_counts(filters),
+        **filters,
     }
 
     return render(request, 'main/job_list.html', context)
 
 
-# used in split layout on with job list
-def job_detail_panel(request, job_id):
-    # get job id, return 404 if it doesn't exist
-    job = get_object_or_404(Job, id=job_id)
+@read_replica
+def job_feed(request):  # next batch of job cards for infinite scroll
+    jobs, filters = filter_job_list(request)
+    jobs_page = paginate_job_list(request, jobs, filters)
+    fragments.attach_cards(jobs_page)
 
-    has_applied = False
-    saved_jobs = []
+    context = {
+        'jobs': jobs_page,
+    }
+
+    return render(request, 'main/job_cards.html', context)
+
+
+def job_autocomplete(request):  # typeahead for the search and location boxes
+    query = request.GET.get('q', '').strip()
+    field = request.GET.get('field', 'search')
 
-    # check if logged in user have already applied to the job
-    if request.user.is_authenticated:
-        has_applied = Application.objects.filter(
-            job=job, applicant=request.user).exists()
-        # get list of saved job ids for the current user
-        saved_jobs = list(Saved.objects.filter(
-            user=request.user).values_list('job_id', flat=True))
+    # search box suggests titles and companies, location box locations
+    fields = ('location',) if field == 'location' else ('title', 'company')
+    results = suggestions.search(query[:100], fields) if query else []
+
+    return JsonResponse({'suggestions': results})
+
+
+@cache_control(private=True, no_store=True)
+def job_state(request):  # saved/applied flags of the current user for job ids
+    job_ids = [int(job_id) for job_id in request.GET.get('ids', '').split(',')
+               if job_id.isdecimal()][:100]
+
+    saved = []
+    applied = []
+    if request.user.is_authenticated and job_ids:
+        saved = list(Saved.objects.filter(
+            user=request.user, job_id__in=job_ids).values_list('job_id', flat=True))
+        applied = list(Application.objects.filter(
+            applicant=request.user, job_id__in=job_ids).values_list('job_id', flat=True))
+
+    return JsonResponse({
+        'authenticated': request.user.is_authenticated,
+        'saved': saved,
+        'applied': applied,
+    })
+
+
+def job_etag(request, job_id):
+    # bumped whenever the job or its company changes, no query needed
+    return f'{job_id}-{caching.get_version(fragments.job_version(job_id))}'
+
+
+# used in split layout on with job list, same html for every user so
+# browsers and shared caches can keep it and revalidate with the etag
+@read_replica
+@etag(job_etag)
+@cache_control(public=True, no_cache=True)
+def job_detail_panel(request, job_id):
+    # rendered panel comes from the fragment cache, the job is only
+    # loaded (or 404) on a miss
+    panel = fragments.get_panel(job_id, lambda: get_object_or_404(
+        Job.objects.select_related(COMPANY), id=job_id))
 
     context = {
-        'job': job,
-        'has_applied': has_applied,
-        'saved_jobs': saved_jobs,
+        'panel': panel,
     }
 
     return render(request, 'main/job_detail_panel.html', context)
 
 
+@read_replica
 def job_detail_full(request, job_id):  # standalone job detail page
-    job = get_object_or_404(Job, id=job_id)
-
-    has_applied = False
-    saved_jobs = []
+    job = get_object_or_404(Job.objects.select_related(COMPANY), id=job_id)
 
-    if request.user.is_authenticated:
-        has_applied = Application.objects.filter(
-            job=job, applicant=request.user).exists()
-        saved_jobs = list(Saved.objects.filter(
-            user=request.user).values_list('job_id', flat=True))
+    # precomputed neighbors, closest first
+    similar_jobs = list(job_cards(Job.objects.filter(
+        status='active', similar_to__job=job
+    )).order_by('-similar_to__score')[:similar.NEIGHBORS])
+    fragments.attach_cards(similar_jobs)
 
     context = {
         'job': job,
-        'has_applied': has_applied,
-        'saved_jobs': saved_jobs,
+        'similar_jobs': similar_jobs,
     }
 
     return render(request, 'main/job_detail_full.html', context)
@@ -312,17 +416,32 @@ def apply_job(request, job_id):
     job = get_object_or_404(Job, id=job_id)
 
     if request.method == 'POST':
-        form = ApplicationForm(request.POST, request.FILES)
+        form = ApplicationForm(
+            request.POST, request.FILES, saved_resume=student_profile.resume)
         if form.is_valid():
             application = form.save(commit=False)
             application.job = job
             application.applicant = request.user
-            application.save()
+
+            # resumes are stored once per content, hashed during the upload
+            upload = form.cleaned_data.get('resume')
+            if upload:
+                application.resume = resumes.store(
+                    upload, resumes.upload_digest(request, 'resume'))
+            else:
+                application.resume = student_profile.resume.name
+
+            # application, job counters and saved resume are saved together
+            with transaction.atomic():
+                application.save()
+                if upload:
+                    StudentProfile.objects.filter(id=student_profile.id).update(
+                        resume=application.resume.name)
             messages.success(
                 request, "Your application was submitted successfully!")
             return redirect('job_detail_full', job_id=job.id)
     else:
-        form = ApplicationForm()
+        form = ApplicationForm(saved_resume=student_profile.resume)
 
     context = {
         'form': form,
@@ -334,8 +453,9 @@ def apply_job(request, job_id):
 
 @login_required
 def applied_jobs(request):
-    applications = Application.objects.filter(applicant=request.user).select_related(
-        'job', 'job__employer').order_by('-applied_at')
+    applications = job_cards(
+        Application.objects.filter(applicant=request.user), 'job'
+    ).order_by('-applied_at')
 
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
@@ -382,7 +502,9 @@ def toggle_save(request, job_id):
 
 @login_required
 def saved_jobs(request):
-    saves = Saved.objects.filter(user=request.user).select_related('job')
+    saves = job_cards(
+        Saved.objects.filter(user=request.user), 'job'
+    ).order_by('-created_at')
 
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
@@ -402,7 +524,7 @@ def saved_jobs(request):
     page_number = request.GET.get('page')
     save_page = paginator.get_page(page_number)
 
-    saved_job_ids = [save.job.id for save in save_page]
+    saved_job_ids = [save.job_id for save in save_page]
 
     applied_job_ids = list(
         Application.objects.filter(
@@ -438,8 +560,6 @@ def my_jobs(request):
     if status_filter:
         jobs = jobs.filter(status=status_filter)
 
-    jobs = jobs.annotate(app_count=Count('applications'))
-
     paginator = Paginator(jobs, 10)
     page_number = request.GET.get('page')
     jobs_page = paginator.get_page(page_number)
@@ -474,7 +594,12 @@ def delete_job(request, job_id):
     job = get_object_or_404(Job, id=job_id, employer=request.user)
 
     if request.method == 'POST':
-        job.delete()
+        # close it right away so it leaves the listings, the worker deletes
+        # it with its applications and saves
+        job.status = 'closed'
+        with transaction.atomic():
+            job.save()
+            tasks.delete_job.delay(job.id)
         messages.success(
             request, f'Job "{job.title}" has been deleted successfully.')
 
@@ -485,11 +610,12 @@ def delete_job(request, job_id):
 def view_applications(request, job_id):
     job = get_object_or_404(Job, id=job_id, employer=request.user)
 
-    applications = Application.objects.filter(job=job).select_related(
-        'applicant__userprofile').order_by('-applied_at')
+    context = get_applications_context(job, request.GET)
+    return render(request, 'main/view_applications.html', context)
 
-    search_query = request.GET.get('search', '')
-    status_filter = request.GET.get('status', '')
+
+def filter_applications(job, search_query, status_filter):
+    applications = Application.objects.filter(job=job)
 
     # can search by name, email
     if search_query:
@@ -502,17 +628,109 @@ def view_applications(request, job_id):
     if status_filter:
         applications = applications.filter(status=status_filter)
 
-    paginator = Paginator(applications, 10)
-    page_number = request.GET.get('page')
-    applications_page = paginator.get_page(page_number)
+    return applications
+
+
+def get_applications_context(job, params):
+    search_query = params.get('search', '')
+    status_filter = params.get('status', '')
+    sort = params.get('sort', '')
+
+    applications = filter_applications(
+        job, search_query, status_filter
+    ).select_related(
+        'applicant__userprofile__studentprofile').order_by('-applied_at')
 
     context = {
         'job': job,
-        'applications': applications_page,
         'search_query': search_query,
         'status_filter': status_filter,
+        'sort': sort,
     }
-    return render(request, 'main/view_applications.html', context)
+
+    if sort == 'match':
+        context['applications'] = get_ranked_page(
+            job, applications, params.get('page'))
+        return context
+
+    paginator = Paginator(applications, 10)
+    # counters on the job already know the total, skip the COUNT(*)
+    if not search_query and (
+            not status_filter or status_filter in counters.STATUS_COUNTERS):
+        paginator.count = getattr(job, counters.STATUS_COUNTERS.get(
+            status_filter, 'application_count'))
+    page_number = params.get('page')
+    context['applications'] = paginator.get_page(page_number)
+    return context
+
+
+def get_ranked_page(job, applications, page_number):
+    # score every matching applicant at once, then load only this page
+    ranked = ranking.rank_applications(
+        job, list(applications.values_list('id', 'applicant_id')))
+    applications_page = Paginator(ranked, 10).get_page(page_number)
+
+    rows = applications.in_bulk([app_id for app_id, _, _ in applications_page])
+    page = []
+    for app_id, _, matched in applications_page:
+        app = rows[app_id]
+        app.matched_skills = matched
+        page.append(app)
+    applications_page.object_list = page
+    return applications_page
+
+
+@login_required
+def bulk_update_applications(request, job_id):
+    job = get_object_or_404(Job, id=job_id, employer=request.user)
+    if request.method != 'POST':
+        return redirect('view_applications', job_id=job.id)
+
+    new_status = {'accept': 'accepted', 'reject': 'rejected'}.get(
+        request.POST.get('action'))
+
+    # either the ticked rows or everything matching the current filter
+    if request.POST.get('scope') == 'filter':
+        selected = filter_applications(
+            job, request.POST.get('search', ''), request.POST.get('status', ''))
+    else:
+        # a non numeric id would make the query raise, isdecimal() also
+        # drops digits int() can't read such as "²"
+        app_ids = [app_id for app_id in request.POST.getlist('ids') if app_id.isdecimal()]
+        selected = Application.objects.filter(job=job, id__in=app_ids)
+
+    updated = 0
+    if new_status:
+        # one UPDATE for the whole set, then recount this job's counters
+        with transaction.atomic():
+            changed = list(selected.exclude(status=new_status).values_list(
+                'id', flat=True))
+            updated = Application.objects.filter(id__in=changed).update(
+                status=new_status)
+            if updated:
+                counters.reconcile(Job.objects.filter(id=job.id))
+                tasks.notify_status_change(changed)
+        job.refresh_from_db(fields=Job.COUNTER_FIELDS)
+
+    if new_status:
+        message = f'{updated} application{pluralize(updated)} marked as {new_status}.'
+    else:
+        message = 'Choose accept or reject.'
+
+    # js gets the refreshed table back instead of a redirect
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        context = get_applications_context(job, request.POST)
+        context['message'] = message
+        return render(request, 'main/application_table.html', context)
+
+    if new_status:
+        messages.success(request, message)
+    else:
+        messages.error(request, message)
+    query = urlencode({key: request.POST[key] for key in ('search', 'status', 'sort', 'page')
+                       if request.POST.get(key)})
+    url = reverse('view_applications', args=[job.id])
+    return redirect(f'{url}?{query}' if query else url)
 
 
 @login_required
@@ -520,8 +738,12 @@ def accept_application(request, app_id):
     if request.method == 'POST':
         app = get_object_or_404(Application, id=app_id)
 
+        changed = app.status != 'accepted'
         app.status = 'accepted'
-        app.save()
+        with transaction.atomic():
+            app.save()
+            if changed:
+                tasks.notify_status_change([app.id])
 
         messages.success(
             request, f'Application has been accepted.')
@@ -534,10 +756,30 @@ def reject_application(request, app_id):
     if request.method == 'POST':
         app = get_object_or_404(Application, id=app_id)
 
+        changed = app.status != 'rejected'
         app.status = 'rejected'
-        app.save()
+        with transaction.atomic():
+            app.save()
+            if changed:
+                tasks.notify_status_change([app.id])
 
         messages.success(
             request, f'Application has been rejected.')
 
     return redirect('view_applications', job_id=app.job.id)
+
+
+@login_required
+def download_resume(request, app_id):
+    # only the employer who posted the job and the applicant, 404 for
+    # everyone else so ids can't be probed
+    app = get_object_or_404(
+        Application.objects.filter(
+            Q(job__employer=request.user) | Q(applicant=request.user)
+        ).only('id', 'resume'),
+        id=app_id)
+    if not app.resume:
+        raise Http404('No resume on this application.')
+
+    extension = os.path.splitext(app.resume.name)[1]
+    return resumes.serve(request, app.resume.name, f'resume-{app.id}{extension}')